@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+BNI – Benchmark e corpus sintetico
+==================================
+Genera memberlist e pagine memberdetail sintetiche (stessi widget e classi
+letti dal parser, con header, menu e script di contorno per avere pagine di
+dimensione realistica) a qualsiasi scala, con variazioni controllate: campi
+mancanti, bio lunghe, titoli e nomi insoliti. Ogni membro dipende solo da seed
+e posizione, quindi il corpus è riproducibile anche a pezzi.
+
+Modalità:
+    pool    parsing seriale vs pool di processi di parse_batch() (default)
+    scale   throughput, picco di memoria e curva di scala di ogni fase
+            (memberlist, estrazione id, parsing, card, ricerca, snapshot) per
+            più dimensioni, confrontabili con una baseline salvata
+    cards   costo per card di render_card() (completa, --lazy) e card_details()
+    corpus  scrive il corpus come fixture per bni_fixture_server.py
+
+Esecuzione:
+    python bni_benchmark.py --pages 2000
+    python bni_benchmark.py --pages 5000 --workers 8 --fast-parse
+    python bni_benchmark.py scale --sizes 1000,10000,100000 --save-baseline
+    python bni_benchmark.py scale --sizes 1000,10000,100000 --baseline
+    python bni_benchmark.py cards --pages 500 --repeat 7
+    python bni_benchmark.py corpus --pages 10000 --out fixtures-10k --missing 0.2
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+import urllib.parse
+
+import bni_scraper
+from bni_scraper import (CHAPTER_ID, CHAPTER_SLUG, MemberRecord, Recorder, dump_search_index,
+                         card_details, extract_member_ids, member_hash, parse_batch,
+                         parse_member_html, parse_workers, render_card, write_snapshot)
+
+FIRST = ["Marco", "Giulia", "Luca", "Francesca", "Andrea", "Chiara", "Paolo", "Elena",
+         "Davide", "Sara", "Matteo", "Valentina", "Stefano", "Federica", "Nicolò"]
+LAST  = ["Rossi", "Bianchi", "Ferrari", "Esposito", "Romano", "Colombo", "Ricci",
+         "Marino", "Greco", "Bruno", "Gallo", "Conti", "De Luca", "Costa", "Giordano"]
+JOBS  = ["Commercialista", "Avvocato", "Architetto", "Agente immobiliare", "Fotografo",
+         "Consulente assicurativo", "Idraulico", "Elettricista", "Web designer",
+         "Notaio", "Serramentista", "Consulente marketing", "Geometra"]
+TOWNS = ["Sanremo", "Ventimiglia", "Bordighera", "Imperia", "Taggia", "Arma di Taggia"]
+WORDS = ("aiuto aziende famiglie professionisti progetto clienti qualità servizio "
+         "territorio esperienza soluzioni consulenza sviluppo fiducia rete").split()
+
+# Variazioni "difficili" (--odd): titoli composti, apostrofi, accenti, maiuscole
+ODD_TITLES = ["Dott.ssa ", "Ing. Arch. ", "Prof. Avv. ", "dott. ", "Geom. ", "Rag. ", "AVV. "]
+ODD_FIRST  = ["Maria Grazia", "Jean-Luc", "Zoë", "Anna Maria Lucia", "Ngozi", "LORENZO"]
+ODD_LAST   = ["D'Angelo", "Dell'Acqua", "De' Medici", "Van der Berg", "Lo Iacono", "Żółkiewski"]
+LONG_BIO   = (20, 60)      # paragrafi di una bio lunga (--long-bio)
+
+PAGE = """<!DOCTYPE html><html lang="it"><head><meta charset="utf-8"><title>{name}</title>
+{scripts}</head><body><header class="siteHeader"><nav><ul>{menu}</ul></nav></header>
+<main><div class="row"><div class="col-md-8">
+<div class="widgetMemberProfileTop"><div class="memberProfileInfo">
+{photo}<h2>{title}{name}</h2><p>{company}</p><p>{job}</p>
+<div class="memberContactDetails">{phone}</div>
+<div class="smUrls">{social}</div>
+</div></div>
+<div class="widgetMemberCompanyDetail"><div class="textHolder"><p>{name}</p><p>{company}</p>
+{address}<p>Italia</p></div></div>
+{logo}{mail}<div class="widgetMemberTxtVideo"><h3>Il mio business</h3>{bio}</div>
+</div><aside class="col-md-4">{aside}</aside></div></main>
+<footer class="siteFooter">{footer}</footer></body></html>"""
+
+LIST_PAGE = """<!DOCTYPE html><html lang="it"><head><meta charset="utf-8"><title>Membri</title>
+{scripts}</head><body><header class="siteHeader"><nav><ul>{menu}</ul></nav></header>
+<main><div class="widgetMemberList"><table class="listtables">
+<thead><tr><th>Nome</th><th>Azienda</th><th>Professione</th><th>Telefono</th></tr></thead>
+<tbody>
+{rows}
+</tbody></table></div></main>
+<footer class="siteFooter">{footer}</footer></body></html>"""
+
+LIST_ROW = ('<tr><td><a href="/{slug}/it/memberdetails?encryptedMemberId={id}&amp;name={q}">'
+            '<span class="memberName">{title}{name}</span></a></td><td>{company}</td>'
+            '<td>{job}</td><td>{phone}</td></tr>')
+
+SCRIPTS = "".join(f'<script src="/js/bundle{k}.js"></script>' for k in range(12))
+MENU    = "".join(f'<li><a href="/it/pagina{k}">Voce {k}</a></li>' for k in range(40))
+FOOTER  = "".join(f'<a href="/it/link{k}">Link {k}</a>' for k in range(60))
+
+STAGES        = ("list_parse", "extract", "parse", "render", "search", "snapshot")
+BASELINE_FILE = "benchmark_baseline.json"
+
+
+# ─── Corpus ────────────────────────────────────────────────────────────────────
+
+def person(i: int, seed: int = 1, missing: float = 0.0, long_bio: float = 0.0,
+           odd: float = 0.0) -> dict:
+    # Membro i-esimo: dipende solo da (seed, i), non dai membri precedenti
+    rng   = random.Random(f"{seed}:{i}")
+    strange = rng.random() < odd
+    first = rng.choice(ODD_FIRST if strange else FIRST)
+    last  = rng.choice(ODD_LAST if strange else LAST)
+    has   = lambda: rng.random() >= missing
+    return {
+        "i":       i,
+        "seed":    seed,
+        "id":      f"SYN{i}",
+        "name":    f"{first} {last}",
+        "last":    last,
+        "title":   rng.choice(ODD_TITLES if strange else ["", "Dott. ", "Avv. ", "Arch. "]),
+        "job":     rng.choice(JOBS) if has() else "",
+        "company": f"{last} {rng.choice(['Srl', 'Snc', '& Partners', 'Studio'])}" if has() else "",
+        "town":    rng.choice(TOWNS) if has() else "",
+        "num":     rng.randint(1, 200),
+        "phone":   f"+39 0184 {i:06d}" if has() else "",
+        "mail":    f"{first.lower()}.{last.lower()}{i}".replace(" ", "").replace("'", "")
+                   if has() else "",
+        "social":  [s for s in ("facebook", "linkedin", "instagram", "website") if has()],
+        "photo":   has(),
+        "logo":    has(),
+        "bio":     (rng.randint(*LONG_BIO) if rng.random() < long_bio
+                    else rng.randint(1, 4) if has() else 0),
+    }
+
+
+def synthetic_detail(p: dict) -> str:
+    # Pagina memberdetail del membro `p` (vedi person())
+    i, rng = p["i"], random.Random(f"bio:{p['seed']}:{p['i']}")
+    social = {
+        "facebook":  f'<a href="https://www.facebook.com/m{i}"><img alt="facebook"></a>',
+        "linkedin":  f'<a href="https://www.linkedin.com/in/m{i}"><img alt="linkedin"></a>',
+        "instagram": f'<a href="https://www.instagram.com/m{i}"><img alt="instagram"></a>',
+        "website":   f'<a href="https://www.m{i}.it"><img alt="website"></a>',
+    }
+    return PAGE.format(
+        name=p["name"], title=p["title"], company=p["company"], job=p["job"],
+        photo=(f'<div class="profilephoto"><img class="img-responsive" '
+               f'src="/images/members/{i}.jpg" alt=""></div>' if p["photo"] else ""),
+        phone=f'<a href="tel:{p["phone"]}">{p["phone"]}</a>' if p["phone"] else "",
+        social="\n".join(social[s] for s in p["social"]),
+        address=(f'<p>Via {p["last"]} {p["num"]}</p><p>18038 {p["town"]} (IM)</p>'
+                 if p["town"] else ""),
+        logo=(f'<div class="companyLogo"><img src="/images/logos/{i}.png" alt=""></div>\n'
+              if p["logo"] else ""),
+        mail=(f'<a href="mailto:{p["mail"]}@example.it">{p["mail"]}@example.it</a>\n'
+              if p["mail"] else ""),
+        bio="".join(f"<p>{' '.join(rng.choices(WORDS, k=rng.randint(20, 60)))}.</p>"
+                    for _ in range(p["bio"])),
+        scripts=SCRIPTS, menu=MENU, footer=FOOTER,
+        aside="".join(f'<div class="widget"><p>{" ".join(rng.choices(WORDS, k=30))}</p></div>'
+                      for _ in range(6)),
+    )
+
+
+def synthetic_list(people) -> str:
+    # Memberlist con una riga (nome, azienda, professione, telefono) per membro
+    rows = "\n".join(LIST_ROW.format(slug=CHAPTER_SLUG, q=urllib.parse.quote(p["name"]), **{
+        k: p[k] for k in ("id", "title", "name", "company", "job", "phone")}) for p in people)
+    return LIST_PAGE.format(rows=rows, scripts=SCRIPTS, menu=MENU, footer=FOOTER)
+
+
+def member_meta(p: dict) -> dict:
+    return {"id": p["id"], "param": "encryptedMemberId", "name_raw": p["title"] + p["name"],
+            "href": ""}
+
+
+def synthetic_page(i: int, seed: int = 1, **variation) -> tuple:
+    # (html, meta) di un membro inventato ma plausibile
+    p = person(i, seed, **variation)
+    return synthetic_detail(p), member_meta(p)
+
+
+def corpus(pages: int, seed: int = 1, **variation) -> list:
+    return [synthetic_page(i, seed, **variation) for i in range(pages)]
+
+
+def variation(args: argparse.Namespace) -> dict:
+    return {"missing": args.missing, "long_bio": args.long_bio, "odd": args.odd}
+
+
+# ─── Misure ────────────────────────────────────────────────────────────────────
+
+def measure(fn, *args, repeat: int = 1) -> tuple:
+    # (secondi, picco di memoria in byte, risultato): il tempo è il migliore di
+    # `repeat` esecuzioni senza tracemalloc, la memoria da un'esecuzione tracciata
+    seconds = math.inf
+    for _ in range(repeat):
+        t0  = time.perf_counter()
+        out = fn(*args)
+        seconds = min(seconds, time.perf_counter() - t0)
+        del out
+    tracemalloc.start()
+    out = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, out
+
+
+def parse_sample(jobs: list) -> list:
+    return [parse_member_html(text, meta, fast) for text, meta, fast in jobs]
+
+
+def render_all(details: list) -> list:
+    return [render_card(m) for m in details]
+
+
+def snapshot_all(details: list, path: str) -> bool:
+    return write_snapshot(path, (MemberRecord.from_detail(f"SYN{i}", m, member_hash(m))
+                                 for i, m in enumerate(details)))
+
+
+def run_size(n: int, args: argparse.Namespace) -> dict:
+    # Tutte le fasi su un roster di n membri; il parsing dei dettagli (lineare
+    # per costruzione, una pagina alla volta) gira su un campione di --sample pagine
+    var    = variation(args)
+    people = [person(i, args.seed, **var) for i in range(n)]
+    sample = people[:min(n, args.sample)]
+    jobs   = [(synthetic_detail(p), member_meta(p), args.fast_parse) for p in sample]
+    list_html = synthetic_list(people)
+    parser = bni_scraper.FAST_PARSER if args.fast_parse else "html.parser"
+    results = {}
+
+    def stage(name, items, nbytes, fn, *fn_args):
+        seconds, peak, out = measure(fn, *fn_args, repeat=args.repeat)
+        results[name] = {"items": items, "s": round(seconds, 4),
+                         "per_s": round(items / seconds, 1) if seconds else None,
+                         "peak_mb": round(peak / 1024 / 1024, 2),
+                         "mb": round(nbytes / 1024 / 1024, 2)}
+        print(f"   {name:10s} {items:8d}  {seconds:8.3f}s  {items / max(seconds, 1e-9):10.0f}/s  "
+              f"picco {peak / 1024 / 1024:7.1f} MB")
+        return out
+
+    soup = stage("list_parse", n, len(list_html), bni_scraper.BeautifulSoup, list_html, parser)
+    ids  = stage("extract", n, 0, extract_member_ids, soup, True)
+    if len(ids) != n:
+        raise SystemExit(f"❌  estratti {len(ids)} membri su {n}")
+    soup.decompose()
+    del soup, list_html
+
+    parsed  = stage("parse", len(jobs), sum(len(t) for t, _, _ in jobs), parse_sample, jobs)
+    details = [parsed[i % len(parsed)] for i in range(n)]
+    cards   = stage("render", n, 0, render_all, details)
+    index   = stage("search", n, 0, dump_search_index, details)
+    results["render"]["mb"] = round(sum(len(c) for c in cards) / 1024 / 1024, 2)
+    results["search"]["mb"] = round(len(index) / 1024 / 1024, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "members.jsonl")
+        stage("snapshot", n, 0, snapshot_all, details, path)
+        results["snapshot"]["mb"] = round(os.path.getsize(path) / 1024 / 1024, 2)
+    return results
+
+
+def scaling(results: dict) -> dict:
+    # Esponente k di t ∝ n^k tra la dimensione più piccola e la più grande,
+    # sul tempo totale della fase rispetto agli elementi lavorati: k ≈ 1
+    # lineare, k > 1 superlineare. Una fase che lavora lo stesso numero di
+    # elementi alle due dimensioni (il parsing, quando entrambe superano
+    # --sample) non ha curva e resta fuori
+    sizes = sorted(results, key=int)
+    out = {}
+    for name in STAGES:
+        a, b = results[sizes[0]][name], results[sizes[-1]][name]
+        if len(sizes) < 2 or a["items"] == b["items"] or not a["s"] or not b["s"]:
+            continue
+        out[name] = round(math.log(b["s"] / a["s"]) / math.log(b["items"] / a["items"]), 2)
+    return out
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    # Fasi più lente della baseline oltre la tolleranza (elementi al secondo)
+    regressions = []
+    print(f"\n📏  Confronto con la baseline ({baseline.get('created', '?')}, "
+          f"tolleranza {tolerance:.0%})")
+    for size, stages in report["results"].items():
+        for name, now in stages.items():
+            was = baseline.get("results", {}).get(size, {}).get(name)
+            if not was or not was.get("per_s") or not now.get("per_s"):
+                continue
+            ratio = was["per_s"] / now["per_s"]
+            flag  = "❌" if ratio > 1 + tolerance else "✅"
+            print(f"   {flag} {name:10s} n={size:>7s}  {was['per_s']:10.0f}/s → "
+                  f"{now['per_s']:10.0f}/s  ({ratio:.2f}× il tempo)")
+            if ratio > 1 + tolerance:
+                regressions.append((name, size, ratio))
+    return regressions
+
+
+# ─── Modalità ──────────────────────────────────────────────────────────────────
+
+def timed(jobs: list, workers: int) -> tuple:
+    t0 = time.perf_counter()
+    out = parse_batch(jobs, workers)
+    return time.perf_counter() - t0, out
+
+
+def bench_pool(args: argparse.Namespace):
+    pages = corpus(args.pages, args.seed, **variation(args))
+    jobs  = [(html, meta, args.fast_parse) for html, meta in pages]
+    size  = sum(len(html) for html, _ in pages)
+    workers = parse_workers(len(jobs), args.workers)
+    print(f"🧪  {len(jobs)} pagine sintetiche, {size / 1024 / 1024:.1f} MB, "
+          f"{os.cpu_count()} core")
+
+    serial, expected = timed(jobs, 1)
+    print(f"   seriale      {serial:7.2f}s  {len(jobs) / serial:8.0f} pagine/s")
+    if workers == 1:
+        print("   pool         non usato: una sola CPU o troppe poche pagine")
+        return
+    pooled, got = timed(jobs, workers)
+    print(f"   {workers:2d} processi  {pooled:7.2f}s  {len(jobs) / pooled:8.0f} pagine/s  "
+          f"→ {serial / pooled:.2f}×")
+    if got != expected:
+        raise SystemExit("❌  risultati diversi tra seriale e pool")
+    print("   risultati identici, nello stesso ordine")
+
+
+def bench_scale(args: argparse.Namespace):
+    bni_scraper.import_parser()
+    sizes   = [int(s) for s in args.sizes.split(",")]
+    results = {}
+    for n in sizes:
+        print(f"\n🧪  {n} membri (parsing su {min(n, args.sample)} pagine"
+              + (", --fast-parse" if args.fast_parse else "") + ")")
+        results[str(n)] = run_size(n, args)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python":  platform.python_version(),
+        "machine": f"{platform.machine()}, {os.cpu_count()} core",
+        "options": {"sample": args.sample, "fast_parse": args.fast_parse, "seed": args.seed,
+                    "repeat": args.repeat, **variation(args)},
+        "results": results,
+        "scaling": scaling(results),
+    }
+    if report["scaling"]:
+        print(f"\n📈  Scala tra {sizes[0]} e {sizes[-1]} membri (tempo ∝ n^k)")
+        for name, k in report["scaling"].items():
+            print(f"   {name:10s} k = {k:.2f}" + ("  ⚠️  superlineare" if k > 1.2 else ""))
+        first, last = results[str(sizes[0])], results[str(sizes[-1])]
+        for name in STAGES:
+            if first[name]["items"] == last[name]["items"]:
+                print(f"   {name:10s} esclusa: stesso campione di {args.sample} pagine "
+                      f"a ogni dimensione")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\n📝  Risultati → {args.output}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"💾  Baseline → {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("options") != report["options"]:
+            print("⚠️  La baseline è stata misurata con opzioni diverse")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f"❌  {len(regressions)} fasi più lente della baseline")
+
+
+def bench_cards(args: argparse.Namespace):
+    # Microbenchmark del rendering: µs per card sui dettagli parsati di --pages
+    # membri sintetici, migliore di --repeat passate (timeit, senza GC)
+    bni_scraper.import_parser()
+    details = parse_sample([(html, meta, False) for html, meta in
+                            corpus(args.pages, args.seed, **variation(args))])
+    shard   = ("details/0.json?v=0", 0)
+    cases = {
+        "completa": lambda: [render_card(m) for m in details],
+        "sprite":   lambda: [render_card(m, True) for m in details],
+        "lazy":     lambda: [render_card(m, True, shard) for m in details],
+        "dettagli": lambda: [card_details(m, True) for m in details],
+    }
+    print(f"🧪  {len(details)} card, migliore di {args.repeat} passate")
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        out  = fn()
+        size = sum(len(c) if isinstance(c, str) else sum(map(len, c)) for c in out)
+        print(f"   {name:10s} {seconds / len(details) * 1e6:7.2f} µs/card  "
+              f"{size / len(details):7.0f} caratteri/card")
+
+
+def write_corpus(args: argparse.Namespace):
+    # Memberlist e dettagli come fixture, un file alla volta (scala arbitraria)
+    var      = variation(args)
+    recorder = Recorder(args.out)
+    recorder.save_list(CHAPTER_ID, synthetic_list(person(i, args.seed, **var)
+                                                  for i in range(args.pages)))
+    for i in range(args.pages):
+        p = person(i, args.seed, **var)
+        recorder.save_detail(p["id"], synthetic_detail(p))
+    print(f"📁  {args.pages} membri sintetici → {args.out}")
+    print(f"   python bni_fixture_server.py {args.out}")
+
+
+MODES = {"pool": bench_pool, "scale": bench_scale, "cards": bench_cards,
+         "corpus": write_corpus}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Corpus sintetico e benchmark delle fasi")
+    p.add_argument("mode", nargs="?", default="pool", choices=MODES,
+                   help="pool: seriale vs pool di processi (default); scale: tutte le fasi "
+                        "a più dimensioni; corpus: scrive le fixture")
+    p.add_argument("--pages", type=int, default=2000, help="pagine sintetiche (default 2000)")
+    p.add_argument("--workers", type=int, default=0,
+                   help="processi del pool, 0 = automatico come nella fase parse")
+    p.add_argument("--fast-parse", action="store_true", help="parsing ridotto ai widget")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--missing", type=float, default=0.1,
+                   help="probabilità che manchi ciascun campo facoltativo (default 0.1)")
+    p.add_argument("--long-bio", type=float, default=0.02,
+                   help=f"quota di bio lunghe, {LONG_BIO[0]}-{LONG_BIO[1]} paragrafi (default 0.02)")
+    p.add_argument("--odd", type=float, default=0.05,
+                   help="quota di nomi e titoli insoliti: apostrofi, accenti, titoli composti")
+    p.add_argument("--sizes", default="1000,10000",
+                   help="scale: dimensioni del roster separate da virgole (default 1000,10000)")
+    p.add_argument("--sample", type=int, default=1000,
+                   help="scale: pagine memberdetail parsate per dimensione (default 1000)")
+    p.add_argument("--repeat", type=int, default=3,
+                   help="scale: esecuzioni per fase, si tiene la più veloce (default 3)")
+    p.add_argument("--output", metavar="FILE", default=None,
+                   help="scale: salva i risultati in JSON")
+    p.add_argument("--save-baseline", nargs="?", const=BASELINE_FILE, default=None,
+                   metavar="FILE", help=f"scale: salva i risultati come baseline "
+                                        f"(default {BASELINE_FILE})")
+    p.add_argument("--baseline", nargs="?", const=BASELINE_FILE, default=None, metavar="FILE",
+                   help="scale: confronta con la baseline; esce con errore se una fase è "
+                        "più lenta oltre --tolerance")
+    p.add_argument("--tolerance", type=float, default=0.25,
+                   help="scale: rallentamento ammesso rispetto alla baseline (default 0.25)")
+    p.add_argument("--out", default="fixtures-synthetic",
+                   help="corpus: cartella delle fixture (default fixtures-synthetic)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    MODES[args.mode](args)
+
+
+if __name__ == "__main__":
+    main()
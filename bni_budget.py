@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+BNI – Budget di performance delle pagine
+========================================
+Analizza offline le pagine generate (nessuna richiesta di rete) e confronta le
+misure con un file di budget:
+
+    bytes / gzip_bytes / brotli_bytes   peso della pagina, grezzo e compresso
+    inline_css_bytes                    CSS nei blocchi <style>
+    dom_nodes                           elementi del DOM
+    requests                            risorse referenziate (img, script, css, font, icone)
+    external_origins                    origini esterne distinte di quelle risorse
+    render_blocking                     CSS e script sincroni nell'<head>
+    images_without_dimensions           <img> senza width e height
+    images_without_lazy                 <img> senza loading="lazy"
+
+Esecuzione:
+    python bni_budget.py                           # index.html con budget.json
+    python bni_budget.py chapters/ --budget budget.json --json budget_report.json
+
+Esce con codice 1 se una pagina supera il budget: nella CI blocca il deploy.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import urllib.parse
+from html.parser import HTMLParser
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BUDGET_FILE = "budget.json"
+
+# Ordine e descrizione delle metriche nel report
+METRICS = {
+    "bytes":                     "peso HTML",
+    "gzip_bytes":                "peso gzip",
+    "brotli_bytes":              "peso brotli",
+    "inline_css_bytes":          "CSS inline",
+    "dom_nodes":                 "nodi DOM",
+    "requests":                  "richieste",
+    "external_origins":          "origini esterne",
+    "render_blocking":           "risorse bloccanti",
+    "images_without_dimensions": "img senza dimensioni",
+    "images_without_lazy":       "img senza lazy",
+}
+BYTE_METRICS = {"bytes", "gzip_bytes", "brotli_bytes", "inline_css_bytes"}
+
+CSS_URL_RE = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)|@import\s+['"]([^'"]+)['"]""")
+
+# <link rel=...> che fanno scaricare qualcosa al browser
+FETCH_RELS = {"stylesheet", "icon", "apple-touch-icon", "preload", "modulepreload",
+              "manifest", "shortcut"}
+
+
+class PageStats(HTMLParser):
+    """Conta nodi, risorse e immagini di una pagina in un solo passaggio."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.nodes       = 0
+        self.css_bytes   = 0
+        self.resources   = []       # URL nell'ordine in cui compaiono
+        self.blocking    = 0
+        self.no_size     = 0
+        self.no_lazy     = 0
+        self.in_head     = False
+        self.in_style    = False
+
+    def handle_starttag(self, tag, attrs):
+        self.nodes += 1
+        a = {k: (v or "") for k, v in attrs}
+        if tag == "head":
+            self.in_head = True
+        elif tag == "body":
+            self.in_head = False
+        elif tag == "style":
+            self.in_style = True
+        elif tag == "img":
+            self.add(a.get("src"))
+            self.no_size += not (a.get("width") and a.get("height"))
+            self.no_lazy += a.get("loading") != "lazy"
+        elif tag in ("script", "iframe", "video", "audio", "embed") and a.get("src"):
+            self.add(a["src"])
+            if (tag == "script" and self.in_head and "async" not in a and "defer" not in a
+                    and a.get("type") != "module"):
+                self.blocking += 1
+        elif tag == "link" and a.get("href"):
+            rels = set(a.get("rel", "").lower().split())
+            if rels & FETCH_RELS:
+                self.add(a["href"])
+            if "stylesheet" in rels and self.in_head and a.get("media", "all") in ("all", "screen"):
+                self.blocking += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "style":
+            self.in_style = False
+        elif tag == "head":
+            self.in_head = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            self.css_bytes += len(data.encode("utf-8"))
+            for m in CSS_URL_RE.finditer(data):
+                self.add(m.group(1) or m.group(2))
+
+    def add(self, url):
+        if url and not url.startswith(("data:", "#")):
+            self.resources.append(url)
+
+
+def analyze(path: str) -> dict:
+    # Misure di una pagina; se accanto ci sono .gz / .br precompressi si usano quelli
+    with open(path, "rb") as f:
+        data = f.read()
+    stats = PageStats()
+    stats.feed(data.decode("utf-8", "replace"))
+    stats.close()
+
+    def compressed(ext, compress):
+        if os.path.exists(path + ext):
+            return os.path.getsize(path + ext)
+        return len(compress(data)) if compress else None
+
+    origins = {urllib.parse.urlsplit(u).netloc for u in stats.resources}
+    origins.discard("")
+    return {
+        "bytes":                     len(data),
+        "gzip_bytes":                compressed(".gz", lambda d: gzip.compress(d, 9, mtime=0)),
+        "brotli_bytes":              compressed(".br", brotli and (
+                                         lambda d: brotli.compress(d, quality=11))),
+        "inline_css_bytes":          stats.css_bytes,
+        "dom_nodes":                 stats.nodes,
+        "requests":                  len(set(stats.resources)),
+        "external_origins":          len(origins),
+        "render_blocking":           stats.blocking,
+        "images_without_dimensions": stats.no_size,
+        "images_without_lazy":       stats.no_lazy,
+        "origins":                   sorted(origins),
+    }
+
+
+def find_pages(paths: list) -> list:
+    # File HTML indicati, o tutti quelli sotto le cartelle (senza cartelle nascoste)
+    pages = []
+    for p in paths:
+        if not os.path.isdir(p):
+            pages.append(p)
+            continue
+        for root, dirs, files in os.walk(p):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            pages += [os.path.join(root, f) for f in sorted(files) if f.endswith(".html")]
+    return pages
+
+
+def page_key(page: str, root: str = ".") -> str:
+    # Percorso della pagina relativo alla radice del sito, con "/" come separatore
+    return os.path.relpath(page, root).replace(os.sep, "/")
+
+
+def page_budget(budget: dict, page: str, root: str = ".") -> dict:
+    # Budget "default" più l'eccezione in "pages" per il percorso esatto della
+    # pagina: "index.html" è solo la pagina alla radice, non chapters/*/index.html
+    limits = dict(budget.get("default", {}))
+    limits.update(budget.get("pages", {}).get(page_key(page, root), {}))
+    return limits
+
+
+def fmt(metric: str, value) -> str:
+    if value is None:
+        return "–"
+    if metric in BYTE_METRICS:
+        return f"{value / 1024:.1f} KB"
+    return str(value)
+
+
+def check(pages: list, budget: dict, root: str = ".") -> tuple:
+    # (report, numero di sforamenti)
+    report, failures = [], 0
+    for page in pages:
+        measured = analyze(page)
+        limits   = page_budget(budget, page, root)
+        print(f"\n📄  {page}")
+        rows = []
+        for metric, label in METRICS.items():
+            value, limit = measured[metric], limits.get(metric)
+            over = value is not None and limit is not None and value > limit
+            failures += over
+            status = "❌" if over else ("✅" if limit is not None and value is not None else "  ")
+            print(f"   {status} {label:22s} {fmt(metric, value):>10s}"
+                  + (f"  / {fmt(metric, limit):>10s}" if limit is not None else ""))
+            rows.append({"metric": metric, "value": value, "budget": limit, "over": over})
+        if measured["origins"]:
+            print(f"   origini: {', '.join(measured['origins'])}")
+        report.append({"page": page, "metrics": rows, "origins": measured["origins"]})
+    return report, failures
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Controlla le pagine generate contro un budget")
+    p.add_argument("paths", nargs="*", default=["index.html"],
+                   help="pagine HTML o cartelle da analizzare (default index.html)")
+    p.add_argument("--budget", default=BUDGET_FILE,
+                   help=f"file JSON con i limiti (default {BUDGET_FILE})")
+    p.add_argument("--root", default=".",
+                   help="radice del sito: le chiavi di \"pages\" sono percorsi relativi "
+                        "a questa cartella (default la cartella corrente)")
+    p.add_argument("--json", metavar="FILE", default=None, help="salva il report in JSON")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        with open(args.budget, encoding="utf-8") as f:
+            budget = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌  Budget non leggibile ({args.budget}): {e}")
+    pages = find_pages(args.paths)
+    if not pages:
+        raise SystemExit("❌  Nessuna pagina HTML da analizzare")
+
+    report, failures = check(pages, budget, args.root)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"budget": args.budget, "pages": report}, f, ensure_ascii=False, indent=1)
+    if failures:
+        print(f"\n❌  {failures} limiti superati in {len(pages)} pagine ({args.budget})")
+        sys.exit(1)
+    print(f"\n✅  {len(pages)} pagine entro il budget ({args.budget})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+BNI – Server di fixture locale
+==============================
+Riproduce offline gli endpoint memberlist / memberdetail del portale BNI a
+partire dalle risposte registrate con:
+
+    python bni_scraper.py --record fixtures/
+
+Esecuzione:
+    python bni_fixture_server.py fixtures/ --port 8765 --latency 120 --error-rate 0.05
+    python bni_scraper.py --base-url http://127.0.0.1:8765
+
+Latenza (con jitter) ed errori HTTP casuali sono configurabili per misurare lo
+scraper in condizioni ripetibili, senza rete.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bni_scraper import MEMBER_DETAIL_PATH, MEMBER_LIST_PATH, fixture_name, list_fixture_name
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = "BNIFixture/1.0"
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def do_POST(self):
+        cfg    = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        form   = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+
+        if self.path == MEMBER_LIST_PATH:
+            params = urllib.parse.parse_qs((form.get("parameters") or [""])[0])
+            chapter_id = (params.get("chapterName") or [""])[0]
+            path = os.path.join(cfg.directory, list_fixture_name(chapter_id))
+        elif self.path == MEMBER_DETAIL_PATH:
+            member_id = (form.get("memberId") or [""])[0]
+            path = os.path.join(cfg.directory, "memberdetail", fixture_name(member_id))
+        else:
+            return self._send(404, b"endpoint sconosciuto")
+
+        delay = cfg.latency + cfg.rng.uniform(-cfg.jitter, cfg.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if cfg.error_rate and cfg.roll() < cfg.error_rate:
+            return self._send(cfg.error_status, b"errore simulato",
+                              {"Retry-After": "1"} if cfg.error_status in (429, 503) else None)
+
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            return self._send(404, b"fixture mancante")
+
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", {"ETag": etag})
+        self._send(200, body, {"ETag": etag})
+
+    def _send(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory: str, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = None,
+                 quiet: bool = False):
+        super().__init__(address, FixtureHandler)
+        self.directory    = directory
+        self.latency      = latency
+        self.jitter       = jitter
+        self.error_rate   = error_rate
+        self.error_status = error_status
+        self.quiet        = quiet
+        self.rng          = random.Random(seed)
+        self._rng_lock    = threading.Lock()
+
+    def roll(self) -> float:
+        with self._rng_lock:
+            return self.rng.random()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Server locale che riproduce le fixture BNI")
+    p.add_argument("directory", help="cartella creata con bni_scraper.py --record")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0,
+                   help="latenza artificiale per risposta, in millisecondi")
+    p.add_argument("--jitter", type=float, default=0.0,
+                   help="variazione casuale ± della latenza, in millisecondi")
+    p.add_argument("--error-rate", type=float, default=0.0,
+                   help="frazione di richieste che falliscono (0–1)")
+    p.add_argument("--error-status", type=int, default=503,
+                   help="codice HTTP degli errori simulati (default 503)")
+    p.add_argument("--seed", type=int, default=None,
+                   help="seme per latenza ed errori riproducibili")
+    p.add_argument("--quiet", action="store_true", help="non stampare le richieste")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FixtureServer(
+        (args.host, args.port), args.directory,
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, error_status=args.error_status,
+        seed=args.seed, quiet=args.quiet,
+    )
+    print(f"🧪  Fixture da {args.directory} su http://{args.host}:{args.port}")
+    print(f"   → python bni_scraper.py --base-url http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
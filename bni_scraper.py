@@ -9,52 +9,97 @@ Logo: metti il file del logo BNI nella cartella /img
 
 Requisiti:
     pip install requests beautifulsoup4
+    pip install lxml              # opzionale, per --fast-parse
+    pip install Pillow            # opzionale, per --images
+    pip install brotli            # opzionale, per index.html.br con --minify
 
 Esecuzione:
     python bni_scraper_ventimiglia.py
+    python bni_scraper_ventimiglia.py --workers 8 --rate 5
+    python bni_scraper_ventimiglia.py --config chapters.example.json
+    python bni_scraper_ventimiglia.py fetch && python bni_scraper_ventimiglia.py parse
+    python bni_scraper_ventimiglia.py render      # solo pagine, dallo snapshot
 """
 
-import requests
+from __future__ import annotations
+
+import os
+import argparse
+import bisect
+import collections
+import hashlib
 import json
+import threading
 import time
 import re
-from bs4 import BeautifulSoup
+import copy
+import cProfile
+import gc
+import gzip
+import html
+import importlib.util
+import io
+import itertools
+import math
+import operator
+import pstats
+import random
+import sqlite3
+import tracemalloc
+import unicodedata
+import urllib.parse
+import zlib
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, fields as dataclass_fields, replace
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from string import Template
+
+# requests e BeautifulSoup si importano solo nelle fasi che li usano (vedi
+# import_network() / import_parser()): il solo render parte senza caricarli
+requests = None
+BeautifulSoup = SoupStrainer = None
+
+# lxml: parser opzionale, più veloce di html.parser; lo sceglie import_parser()
+FAST_PARSER = None
+
+# Pillow (--images) e brotli (.br di --minify): opzionali, caricati da
+# import_images() / import_brotli() solo quando servono. None = non ancora
+# cercati, False = non installati
+Image = ImageOps = None
+brotli = None
 
 # ─── Configurazione ────────────────────────────────────────────────────────────
 
-BASE_URL       = "https://bni-riviereliguri.it"
+BASE_URL       = os.environ.get("BNI_BASE_URL", "https://bni-riviereliguri.it")
 CHAPTER_ID     = "36677"
 REGION_ID      = "13076"
 WEBSITE_ID     = "20473"
 WEBSITE_TYPE   = "3"
 LOCALE         = "it"
 
+MEMBER_LIST_PATH   = "/bnicms/v3/frontend/memberlist/display"
+MEMBER_DETAIL_PATH = "/bnicms/v3/frontend/memberdetail/display"
+
+# Capitolo predefinito (usato senza --config)
+CHAPTER_SLUG    = "17-riviere-liguri-corsaro-nero"
+CHAPTER_NAME    = "Corsaro Nero"
+CHAPTER_CITY    = "Ventimiglia"
+CHAPTER_MEETING = ("INCONTRO SETTIMANALE: Ogni venerd&igrave; ore 7:00<br>\n"
+                   "  Ristorante Palo Santo &ndash; Passeggiata G. Marconi, 5/48-49 "
+                   "&ndash; Ventimiglia (IM), 18039")
+
 # URL della riunione settimanale – usato dal tasto "Vieni a trovarci!"
 VISIT_URL = "https://bni-riviereliguri.it/17-riviere-liguri-corsaro-nero/it/visitorregistration?chapterId=36677"
 
 SESSION_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-    "Referer": f"{BASE_URL}/17-riviere-liguri-corsaro-nero/it/memberlist",
-    "Origin":  BASE_URL,
     "Accept":  "text/html, */*; q=0.01",
     "X-Requested-With": "XMLHttpRequest",
 }
 
-LANGUAGES_PAYLOAD = json.dumps({
-    "availableLanguages": [{
-        "type": "published",
-        "url": "http://bni-riviereliguri.it/17-riviere-liguri-corsaro-nero/it/memberlist",
-        "descriptionKey": "Italiano",
-        "id": 14,
-        "localeCode": "it"
-    }],
-    "activeLanguage": {
-        "id": 14, "localeCode": "it",
-        "descriptionKey": "Italiano", "cookieBotCode": "it"
-    }
-})
-
 MEMBER_LIST_WIDGET_SETTINGS = json.dumps([
     {"key": 113, "name": "Member Names",         "value": "Nome Membro BNI"},
     {"key": 117, "name": "Profession/Specialty", "value": "Professione/Specializzazione"},
@@ -76,29 +121,627 @@ MEMBER_DETAIL_WIDGET_SETTINGS = json.dumps([
     {"key": 217, "name": "Phone",     "value": "Telefono"},
 ])
 
+# Modalità multi-capitolo (--config): cartella di output delle pagine dei capitoli
+CHAPTERS_DIR = "chapters"
+
+# Download concorrente dei dettagli: numero di worker e limite globale di
+# richieste al secondo (token bucket condiviso tra tutti i worker)
+DEFAULT_WORKERS = 4
+DEFAULT_RATE    = 2.5    # richieste/s – equivale al vecchio sleep(0.4)
+DEFAULT_BURST   = 1
+
+# Richieste al portale: timeout separati di connessione e lettura, tentativi con
+# backoff esponenziale (jitter, Retry-After) e circuit breaker dopo errori di fila
+CONNECT_TIMEOUT   = 5
+READ_TIMEOUT      = 20
+REQUEST_TIMEOUT   = (CONNECT_TIMEOUT, READ_TIMEOUT)
+DEFAULT_RETRIES   = 3
+BACKOFF_BASE      = 0.5     # secondi, raddoppia a ogni tentativo
+BACKOFF_MAX       = 30
+RETRY_STATUS      = frozenset({429, 500, 502, 503, 504})
+BREAKER_THRESHOLD = 8       # fallimenti consecutivi che aprono il circuito
+BREAKER_COOLDOWN  = 60
+
+# Cache su disco delle risposte di dettaglio (una voce JSON per membro)
+CACHE_DIR         = ".cache/details"
+DEFAULT_CACHE_TTL = 6 * 3600   # secondi in cui una risposta è riusata senza rete
+CACHE_VERSION     = 1          # da incrementare quando cambia parse_member_detail()
+
+# Parsing veloce (--fast-parse): del dettaglio si costruisce l'albero solo dei
+# widget effettivamente letti da parse_member_detail()
+DETAIL_WIDGETS = frozenset({
+    "widgetMemberProfileTop", "memberProfileInfo", "profilephoto",
+    "widgetMemberCompanyDetail", "memberContactDetails", "smUrls",
+    "widgetMemberTxtVideo", "companyLogo",
+})
+
+# Parsing in processi separati (fase `parse`): BeautifulSoup è puro Python e
+# occupa un core; il pool parte solo da PARSE_POOL_MIN pagine per processo
+PARSE_POOL_MIN          = 64
+PARSE_CHUNKS_PER_WORKER = 4    # lotti per processo: bilanciamento vs overhead IPC
+
+# Fasi separate (fetch / parse / render): risposte grezze salvate da `fetch`
+# nello stesso formato delle fixture di --record
+RAW_DIR = ".cache/raw"
+
+# Metriche dell'esecuzione (tempi e byte per fase, percentili) in JSON
+METRICS_FILE = ".cache/metrics.json"
+
+# Build incrementale: snapshot dei membri estratti e cache delle card renderizzate
+SNAPSHOT_FILE     = "members.jsonl"   # .jsonl.gz per la variante compressa
+SNAPSHOT_VERSION  = 2
+RENDER_CACHE_FILE = ".cache/cards.db"
+RENDER_VERSION    = 5          # da incrementare quando cambia render_card()
+
+# Build in streaming: i dettagli arrivano con al più FETCH_WINDOW richieste in
+# volo per worker; record e card sono scritti a lotti di CHECKPOINT_EVERY membri
+# su file temporanei in BUILD_DIR, con un checkpoint dopo ogni lotto da cui
+# un'esecuzione interrotta riprende. La pagina si pubblica solo alla fine
+BUILD_DIR        = ".cache/build"
+FETCH_WINDOW     = 8
+CHECKPOINT_EVERY = 96          # multiplo di DETAIL_SHARD_SIZE
+COPY_CHUNK       = 1 << 20
+
+# Aggiornamento differenziale (--diff): impronta di ogni riga della memberlist e
+# ora dell'ultimo dettaglio verificato; si riscaricano solo i membri nuovi, quelli
+# con la riga cambiata e quelli verificati da più di DEFAULT_MAX_AGE secondi
+LIST_STATE_FILE = ".cache/list_state.json"
+DEFAULT_MAX_AGE = 24 * 3600
+
+# Immagini locali (--images): foto e loghi scaricati in uno store indirizzato per
+# contenuto e ridimensionati alle misure delle card (.card-avatar 80×80,
+# .card-company-logo alto 28px), in WebP più un formato di ripiego, a 1x e 2x
+IMAGES_DIR    = "img/members"
+AVATAR_SIZE   = 80
+LOGO_HEIGHT   = 28
+LOGO_BOX      = 84   # larghezza del riquadro 3:1 dei loghi remoti, senza misure note
+IMAGE_QUALITY = 82
+IMAGE_VERSION = 2    # da incrementare quando cambiano le varianti generate da _process()
+IMAGE_WORKERS = 2    # download di immagini contemporanei: il resto del pool resta ai dettagli
+
+# Font: di default da Google Fonts; con --self-host i sottoinsiemi WOFF2 latin
+# vengono salvati una volta in FONTS_DIR e serviti dal sito stesso
+FONTS_CSS_URL = ("https://fonts.googleapis.com/css2?family=Playfair+Display:ital,wght@0,700;1,400"
+                 "&family=Lato:wght@300;400;700;900&display=swap")
+FONTS_DIR     = "fonts"
+FONT_SUBSETS  = ("latin", "latin-ext")
+FONT_PRELOAD  = {("Lato", "normal", "400"), ("Lato", "normal", "900")}   # usati sopra la piega
+
+# Build minificata (--minify): accanto a ogni pagina anche .gz e .br alla massima
+# compressione; le dimensioni di ogni pagina pubblicata finiscono in PAGE_WEIGHT_LOG
+PAGE_WEIGHT_LOG = "page_weight.jsonl"
+
+# Ricerca istantanea (--search): accanto a ogni pagina un indice JSON compatto con
+# le posting list (delta-codificate) di prefissi e trigrammi dei testi normalizzati
+SEARCH_FILE         = "search.json"
+SEARCH_VERSION      = 1
+SEARCH_PREFIX_MAX   = 3    # termini fino a 3 caratteri: prefisso; oltre: trigrammi
+SEARCH_BIO_KEYWORDS = 12   # parole chiave della bio indicizzate per membro
+# Dettagli differiti (--lazy): nella griglia solo foto, nome, professione e azienda;
+# logo, bio e contatti in shard JSON di DETAIL_SHARD_SIZE membri in DETAILS_DIR
+DETAILS_DIR          = "details"
+DETAIL_SHARD_SIZE    = 24
+DETAIL_SHARD_VERSION = 1
+
+SEARCH_STOPWORDS = frozenset("""
+    alla alle anche avere come con dalla dalle degli della delle dello dopo essere
+    loro molto nella nelle negli nostra nostro nostri ogni oltre per perché però
+    più quale quando quella quelle quello questa queste questo sono stato sulla
+    tutti tutto una uno with that this from have your our the and for
+""".split())
+
+# Storico dei membri (--history): accanto allo snapshot un file JSONL append-only
+# con le differenze di ogni esecuzione e, ogni HISTORY_CHECKPOINT righe, l'elenco
+# completo; accanto alla pagina CHANGELOG_FILE con gli ultimi CHANGELOG_DAYS giorni
+HISTORY_FILE       = "history.jsonl"
+HISTORY_CHECKPOINT = 30
+CHANGELOG_FILE     = "changelog.html"
+CHANGELOG_DAYS     = 90
+CHANGELOG_FIELDS   = {"name": "nome", "profession": "professione", "company": "azienda"}
+
+# Database SQLite (--db) con i membri di tutti i capitoli e indice full-text
+DB_FILE = "members.db"
+
+# Service worker (--service-worker): alla radice del sito SW_FILE precarica le
+# pagine e i file elencati con il loro hash in ASSET_MANIFEST (indici, shard, font,
+# immagini del guscio); la versione della cache deriva da quegli hash, quindi ogni
+# build che cambia un file invalida la precedente. Foto, loghi e font dello stesso
+# sito vanno in una cache a parte servita stale-while-revalidate, ridotta a
+# SW_IMAGE_MAX voci dopo ogni aggiunta (v2: senza le risposte opache della v1)
+SW_FILE         = "sw.js"
+ASSET_MANIFEST  = "asset-manifest.json"
+SW_SHELL_IMAGES = ("img/bni_logo.png", "img/bni_favicon_without_background.png")
+SW_IMAGE_CACHE  = "bni-img-v2"
+SW_IMAGE_MAX    = 2000
+
+
+# ─── Dipendenze ────────────────────────────────────────────────────────────────
+
+def import_network():
+    global requests
+    if requests is None:
+        import requests
+
+
+def import_parser():
+    global BeautifulSoup, SoupStrainer, DETAIL_STRAINER, FAST_PARSER
+    if BeautifulSoup is None:
+        from bs4 import BeautifulSoup, SoupStrainer
+        DETAIL_STRAINER = SoupStrainer(class_=_is_detail_widget)
+        FAST_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+
+def import_images() -> bool:
+    global Image, ImageOps
+    if Image is None:
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            Image = ImageOps = False
+    return bool(Image)
+
+
+def import_brotli() -> bool:
+    global brotli
+    if brotli is None:
+        try:
+            import brotli
+        except ImportError:
+            brotli = False
+    return bool(brotli)
+
+
+# ─── Capitoli ──────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Chapter:
+    slug:       str                     # es. "17-riviere-liguri-corsaro-nero"
+    chapter_id: str
+    region_id:  str
+    website_id: str
+    name:       str                     # es. "Corsaro Nero"
+    city:       str                     # es. "Ventimiglia"
+    meeting:    str = ""                # HTML con giorno, ora e luogo della riunione
+    visit_url:  str = ""
+    base_url:   str = BASE_URL
+    output:     str = "index.html"
+    snapshot:   str = SNAPSHOT_FILE
+
+    @property
+    def referer(self) -> str:
+        return f"{self.base_url}/{self.slug}/{LOCALE}/memberlist"
+
+    @property
+    def detail_base(self) -> str:
+        return f"{self.base_url}/{self.slug}/{LOCALE}/memberdetails"
+
+
+def default_chapter() -> Chapter:
+    return Chapter(
+        slug=CHAPTER_SLUG, chapter_id=CHAPTER_ID, region_id=REGION_ID,
+        website_id=WEBSITE_ID, name=CHAPTER_NAME, city=CHAPTER_CITY,
+        meeting=CHAPTER_MEETING, visit_url=VISIT_URL, base_url=BASE_URL,
+    )
+
+
+def load_chapters(path: str) -> tuple:
+    """
+    Legge un file JSON del tipo:
+
+        {"base_url": "...", "website_id": "...", "region_id": "...",
+         "output_dir": "chapters",
+         "chapters": [{"slug": "...", "chapter_id": "...", "name": "...", ...}]}
+
+    I valori al primo livello fanno da default per tutti i capitoli; ogni
+    capitolo viene scritto in <output_dir>/<slug>/index.html e l'indice
+    aggregato in <output_dir>/index.html. Restituisce (capitoli, indice).
+    """
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    out_dir  = cfg.get("output_dir", CHAPTERS_DIR)
+    defaults = {k: cfg[k] for k in ("base_url", "website_id", "region_id") if k in cfg}
+    chapters = []
+    for raw in cfg["chapters"]:
+        c = {**defaults, **raw}
+        c.setdefault("output",   os.path.join(out_dir, c["slug"], "index.html"))
+        c.setdefault("snapshot", os.path.join(out_dir, c["slug"], SNAPSHOT_FILE))
+        c.setdefault("visit_url", f"{c.get('base_url', BASE_URL)}/{c['slug']}/{LOCALE}"
+                                  f"/visitorregistration?chapterId={c['chapter_id']}")
+        chapters.append(Chapter(**{k: str(v) for k, v in c.items()}))
+    return chapters, os.path.join(out_dir, "index.html")
+
+
+def languages_payload(chapter: Chapter) -> str:
+    host = urllib.parse.urlsplit(chapter.base_url).netloc
+    return json.dumps({
+        "availableLanguages": [{
+            "type": "published",
+            "url": f"http://{host}/{chapter.slug}/{LOCALE}/memberlist",
+            "descriptionKey": "Italiano",
+            "id": 14,
+            "localeCode": "it"
+        }],
+        "activeLanguage": {
+            "id": 14, "localeCode": "it",
+            "descriptionKey": "Italiano", "cookieBotCode": "it"
+        }
+    })
+
+
+def chapter_headers(chapter: Chapter) -> dict:
+    return {"Referer": chapter.referer, "Origin": chapter.base_url}
+
+
+# ─── Rate limit ────────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Limite di richieste condiviso tra thread: `rate` token/s, al massimo `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate   = rate
+        self.burst  = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last   = time.monotonic()
+        self.lock   = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ─── Retry ─────────────────────────────────────────────────────────────────────
+
+class CircuitOpen(Exception):
+    """Troppi errori consecutivi dal portale: nessuna richiesta fino al cooldown."""
+
+
+def retry_after(resp: requests.Response) -> float:
+    # Secondi indicati da Retry-After (numero o data HTTP), None se assente
+    value = resp.headers.get("Retry-After", "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Ritenta le richieste con backoff esponenziale e jitter; dopo `threshold`
+    fallimenti consecutivi il circuito resta aperto per `cooldown` secondi."""
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, threshold: int = BREAKER_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN):
+        self.retries    = max(0, retries)
+        self.threshold  = threshold
+        self.cooldown   = cooldown
+        self.failures   = 0
+        self.open_until = 0.0
+        self.lock       = threading.Lock()
+
+    def check(self):
+        with self.lock:
+            left = self.open_until - time.monotonic()
+            if self.failures >= self.threshold and left > 0:
+                raise CircuitOpen(f"portale in errore, nuove richieste tra {left:.0f}s")
+
+    def record(self, ok: bool):
+        # Dopo il cooldown passa una richiesta di prova: se fallisce si riapre subito
+        with self.lock:
+            if ok:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.open_until <= time.monotonic():
+                    METRICS.count("breaker_open")
+                self.open_until = time.monotonic() + self.cooldown
+
+    def delay(self, attempt: int, resp: requests.Response = None) -> float:
+        wait = retry_after(resp) if resp is not None else None
+        if wait is None:
+            wait = random.uniform(0, BACKOFF_BASE * 2 ** attempt)   # full jitter
+        return min(wait, BACKOFF_MAX)
+
+    def post(self, session: requests.Session, url: str, limiter: TokenBucket = None,
+             stage: str = "fetch", **kwargs) -> requests.Response:
+        # Ritenta errori di rete, timeout, 429 e 5xx; l'ultima risposta HTTP viene
+        # comunque restituita al chiamante (che decide con raise_for_status).
+        # `stage` misura il solo tentativo andato a buon fine, senza attese
+        for attempt in range(self.retries + 1):
+            self.check()
+            if limiter:
+                t0 = time.perf_counter()
+                limiter.acquire()
+                METRICS.record("rate_wait", time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            try:
+                resp = session.post(url, timeout=REQUEST_TIMEOUT, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.record(False)
+                if attempt == self.retries:
+                    raise
+                wait = self.delay(attempt)
+            else:
+                if resp.status_code not in RETRY_STATUS:
+                    self.record(True)
+                    METRICS.record(stage, time.perf_counter() - t0, len(resp.content))
+                    return resp
+                self.record(False)
+                if attempt == self.retries:
+                    return resp
+                wait = self.delay(attempt, resp)
+            self.check()
+            METRICS.count("retries")
+            time.sleep(wait)
+
+
+# ─── Metriche ──────────────────────────────────────────────────────────────────
+
+class Profiler:
+    """cProfile + tracemalloc sull'intera pipeline, thread dei worker compresi."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.main      = cProfile.Profile()
+        self.threads   = []
+        self.lock      = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tracemalloc.start(25)
+        self.main.enable()
+
+    @contextmanager
+    def thread(self):
+        # sys.setprofile è per-thread: ogni job dei worker ha il suo profilo
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:       # un altro profiler già attivo (Python ≥ 3.12)
+            yield
+            return
+        try:
+            yield
+        finally:
+            prof.disable()
+            with self.lock:
+                self.threads.append(prof)
+
+    def stop(self) -> int:
+        self.main.disable()
+        snap = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        stats = pstats.Stats(self.main)
+        for prof in self.threads:
+            stats.add(prof)
+        stats.dump_stats(os.path.join(self.directory, "profile.pstats"))
+        with open(os.path.join(self.directory, "profile.txt"), "w", encoding="utf-8") as f:
+            pstats.Stats(os.path.join(self.directory, "profile.pstats"), stream=f) \
+                .sort_stats("cumulative").print_stats(60)
+        with open(os.path.join(self.directory, "tracemalloc.txt"), "w", encoding="utf-8") as f:
+            f.write(f"peak: {peak} byte\n\n")
+            for stat in snap.statistics("lineno")[:40]:
+                f.write(f"{stat}\n")
+        return peak
+
+
+class Metrics:
+    """Tempi e byte per fase (list_fetch, fetch, parse, render, ...) e contatori."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock     = threading.Lock()
+        self.samples  = {}
+        self.counters = {"retries": 0}
+        self.pages    = []
+        self.started  = time.perf_counter()
+        self.profiler = None
+
+    def record(self, stage: str, seconds: float, nbytes: int = 0):
+        with self.lock:
+            self.samples.setdefault(stage, []).append((seconds, nbytes))
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def thread_profile(self):
+        if self.profiler:
+            with self.profiler.thread():
+                yield
+        else:
+            yield
+
+    @staticmethod
+    def percentile(values: list, p: float) -> float:
+        # Nearest-rank su una lista già ordinata
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+    def report(self) -> dict:
+        stages = {}
+        with self.lock:
+            for stage, samples in self.samples.items():
+                secs = sorted(s for s, _ in samples)
+                stages[stage] = {
+                    "count":   len(secs),
+                    "total_s": round(sum(secs), 6),
+                    "mean_s":  round(sum(secs) / len(secs), 6),
+                    "p50_s":   round(self.percentile(secs, 50), 6),
+                    "p90_s":   round(self.percentile(secs, 90), 6),
+                    "p95_s":   round(self.percentile(secs, 95), 6),
+                    "p99_s":   round(self.percentile(secs, 99), 6),
+                    "max_s":   round(secs[-1], 6),
+                    "bytes":   sum(b for _, b in samples),
+                }
+            counters = dict(self.counters)
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "wall_s":       round(time.perf_counter() - self.started, 6),
+            "stages":       stages,
+            "counters":     counters,
+            "pages":        list(self.pages),
+        }
+
+    def write(self, path: str) -> dict:
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        atomic_write(path, json.dumps(report, indent=2) + "\n")
+        return report
+
+
+METRICS = Metrics()
+
+
+# ─── Cache risposte ────────────────────────────────────────────────────────────
+
+def atomic_write(path: str, text: str):
+    # Scrive su file temporaneo nella stessa cartella e poi rinomina
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ResponseCache:
+    """
+    Cache persistente delle risposte memberdetail, chiave = id membro + payload.
+    Ogni voce conserva body, hash del contenuto, ora del fetch, validatori HTTP
+    (ETag / Last-Modified) e il dizionario già estratto da parse_member_detail().
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = DEFAULT_CACHE_TTL,
+                 refresh: bool = False):
+        self.directory = directory
+        self.ttl       = ttl
+        self.refresh   = refresh
+        self.lock      = threading.Lock()
+        self.stats     = {"hit": 0, "revalidated": 0, "miss": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(base_url: str, member_id: str, payload: dict) -> str:
+        raw = json.dumps([CACHE_VERSION, base_url, member_id, payload], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str):
+        if self.refresh:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def store(self, key: str, entry: dict):
+        atomic_write(self._path(key), json.dumps(entry, ensure_ascii=False))
+
+    def count(self, kind: str):
+        with self.lock:
+            self.stats[kind] += 1
+        METRICS.count(f"cache_{kind}")
+
+
+def body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ─── Fixture ───────────────────────────────────────────────────────────────────
+
+def fixture_name(member_id: str) -> str:
+    # Gli id cifrati contengono caratteri come "/" e "=": nome file sicuro
+    return urllib.parse.quote(member_id, safe="") + ".html"
+
+
+def list_fixture_name(chapter_id: str) -> str:
+    # Un file di lista per capitolo; il capitolo predefinito tiene il nome storico
+    if chapter_id == CHAPTER_ID:
+        return "memberlist.html"
+    return f"memberlist-{urllib.parse.quote(chapter_id, safe='')}.html"
+
+
+class Recorder:
+    """
+    Salva le risposte memberlist / memberdetail in una cartella di fixture,
+    riproducibili poi offline con bni_fixture_server.py.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "memberdetail"), exist_ok=True)
+
+    def save_list(self, chapter_id: str, text: str):
+        atomic_write(os.path.join(self.directory, list_fixture_name(chapter_id)), text)
+
+    def save_detail(self, member_id: str, text: str):
+        atomic_write(os.path.join(self.directory, "memberdetail", fixture_name(member_id)), text)
+
 
 # ─── Fetch ─────────────────────────────────────────────────────────────────────
 
-def fetch_member_list(session: requests.Session) -> BeautifulSoup:
-    print("📋  Recupero lista membri...")
-    resp = session.post(
-        f"{BASE_URL}/bnicms/v3/frontend/memberlist/display",
-        data={
-            "parameters":           f"chapterName={CHAPTER_ID}&regionIds={REGION_ID}&chapterWebsite=1",
-            "languages":            LANGUAGES_PAYLOAD,
-            "cmsv3":                "true",
-            "website_type":         WEBSITE_TYPE,
-            "website_id":           WEBSITE_ID,
-            "mappedWidgetSettings": MEMBER_LIST_WIDGET_SETTINGS,
-            "pageMode":             "Live_Site",
-        },
-        timeout=30,
+def list_payload(chapter: Chapter) -> dict:
+    return {
+        "parameters":           f"chapterName={chapter.chapter_id}"
+                                f"&regionIds={chapter.region_id}&chapterWebsite=1",
+        "languages":            languages_payload(chapter),
+        "cmsv3":                "true",
+        "website_type":         WEBSITE_TYPE,
+        "website_id":           chapter.website_id,
+        "mappedWidgetSettings": MEMBER_LIST_WIDGET_SETTINGS,
+        "pageMode":             "Live_Site",
+    }
+
+
+def fetch_member_list(session: requests.Session, chapter: Chapter, fast: bool = False,
+                      recorder: Recorder = None, limiter: TokenBucket = None,
+                      retry: RetryPolicy = None) -> BeautifulSoup:
+    print(f"📋  Recupero lista membri... ({chapter.name})")
+    resp = (retry or RetryPolicy(0)).post(
+        session, f"{chapter.base_url}{MEMBER_LIST_PATH}", limiter, "list_fetch",
+        data=list_payload(chapter),
+        headers=chapter_headers(chapter),
     )
     resp.raise_for_status()
-    return BeautifulSoup(resp.text, "html.parser")
+    if recorder:
+        recorder.save_list(chapter.chapter_id, resp.text)
+    t0 = time.perf_counter()
+    soup = BeautifulSoup(resp.text, FAST_PARSER if fast else "html.parser")
+    METRICS.record("list_parse", time.perf_counter() - t0, len(resp.content))
+    return soup
 
 
-def extract_member_ids(soup: BeautifulSoup) -> list:
+def row_fingerprint(row) -> str:
+    # Impronta della riga della memberlist (nome, professione, azienda, telefono, link)
+    links = " ".join(a.get("href", "") for a in row.find_all("a", href=True))
+    return body_hash(row.get_text(" ", strip=True) + "\n" + links)[:16]
+
+
+def extract_member_ids(soup: BeautifulSoup, quiet: bool = False) -> list:
     members = []
     seen = set()
     for a in soup.find_all("a", href=True):
@@ -111,7 +754,9 @@ def extract_member_ids(soup: BeautifulSoup) -> list:
                     seen.add(eid)
                     name_tag = a.find(class_=re.compile(r"name|memberName", re.I)) or a
                     name = name_tag.get_text(strip=True) or a.get_text(strip=True)
-                    members.append({"id": eid, "param": param, "name_raw": name, "href": href})
+                    row  = a.find_parent("tr") or a.parent or a
+                    members.append({"id": eid, "param": param, "name_raw": name, "href": href,
+                                    "row": row_fingerprint(row)})
                 break
     if not members:
         for tag in soup.find_all(attrs={"data-encryptedmemberid": True}):
@@ -119,28 +764,418 @@ def extract_member_ids(soup: BeautifulSoup) -> list:
             if eid not in seen:
                 seen.add(eid)
                 members.append({"id": eid, "param": "encryptedMemberId",
-                                 "name_raw": tag.get_text(strip=True), "href": ""})
-    print(f"   → Trovati {len(members)} membri")
+                                 "name_raw": tag.get_text(strip=True), "href": "",
+                                 "row": row_fingerprint(tag)})
+    if not quiet:
+        print(f"   → Trovati {len(members)} membri")
     return members
 
 
-def fetch_member_detail(session: requests.Session, member: dict) -> dict:
-    resp = session.post(
-        f"{BASE_URL}/bnicms/v3/frontend/memberdetail/display",
-        data={
-            "parameters":           f"{member['param']}={member['id']}",
-            "languages":            LANGUAGES_PAYLOAD,
-            "pageMode":             "Live_Site",
-            "mappedWidgetSettings": MEMBER_DETAIL_WIDGET_SETTINGS,
-            "websitetype":          WEBSITE_TYPE,
-            "website_type":         WEBSITE_TYPE,
-            "website_id":           WEBSITE_ID,
-            "memberId":             member["id"],
-        },
-        timeout=30,
+def poll_roster(session: requests.Session, chapter: Chapter, fast: bool = False,
+                recorder: Recorder = None, retry: RetryPolicy = None) -> list:
+    # Memberlist per --watch, senza messaggi: i membri estratti servono sia al
+    # confronto sia, se l'elenco è cambiato, alla ricostruzione (vedi run())
+    resp = (retry or RetryPolicy(0)).post(
+        session, f"{chapter.base_url}{MEMBER_LIST_PATH}", None, "list_poll",
+        data=list_payload(chapter),
+        headers=chapter_headers(chapter),
+    )
+    resp.raise_for_status()
+    if recorder:
+        recorder.save_list(chapter.chapter_id, resp.text)
+    soup = BeautifulSoup(resp.text, FAST_PARSER if fast else "html.parser")
+    return chapter_members(chapter, soup, quiet=True)
+
+
+def roster_fingerprint(members_meta: list) -> str:
+    # Impronta di id e righe dei membri, indipendente dal resto della risposta
+    # (script, token, markup del widget)
+    return body_hash(json.dumps([(m["id"], m["row"]) for m in members_meta]))
+
+
+def detail_payload(member: dict, chapter: Chapter) -> dict:
+    return {
+        "parameters":           f"{member['param']}={member['id']}",
+        "languages":            languages_payload(chapter),
+        "pageMode":             "Live_Site",
+        "mappedWidgetSettings": MEMBER_DETAIL_WIDGET_SETTINGS,
+        "websitetype":          WEBSITE_TYPE,
+        "website_type":         WEBSITE_TYPE,
+        "website_id":           chapter.website_id,
+        "memberId":             member["id"],
+    }
+
+
+def fetch_member_raw(session: requests.Session, member: dict, chapter: Chapter,
+                     limiter: TokenBucket = None, retry: RetryPolicy = None) -> str:
+    # Solo la risposta grezza, per la fase `fetch`: niente cache né parsing
+    resp = (retry or RetryPolicy(0)).post(
+        session, f"{chapter.base_url}{MEMBER_DETAIL_PATH}", limiter,
+        data=detail_payload(member, chapter),
+        headers=chapter_headers(chapter),
     )
     resp.raise_for_status()
-    return parse_member_detail(BeautifulSoup(resp.text, "html.parser"), member)
+    return resp.text
+
+
+def fetch_member_detail(session: requests.Session, member: dict, chapter: Chapter,
+                        cache: ResponseCache = None, limiter: TokenBucket = None,
+                        fast: bool = False, recorder: Recorder = None,
+                        revalidate: bool = False, retry: RetryPolicy = None) -> dict:
+    payload = detail_payload(member, chapter)
+
+    key   = cache.key(chapter.base_url, member["id"], payload) if cache else None
+    entry = cache.load(key) if cache else None
+    if entry and not revalidate and cache.is_fresh(entry):
+        cache.count("hit")
+        return entry["parsed"]
+
+    # Richiesta condizionale se abbiamo validatori dalla risposta precedente
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    resp = (retry or RetryPolicy(0)).post(
+        session, f"{chapter.base_url}{MEMBER_DETAIL_PATH}", limiter,
+        data=payload,
+        headers={**chapter_headers(chapter), **headers},
+    )
+
+    if resp.status_code == 304 and entry:
+        cache.count("revalidated")
+        entry["fetched_at"] = time.time()
+        cache.store(key, entry)
+        return entry["parsed"]
+    resp.raise_for_status()
+    if recorder:
+        recorder.save_detail(member["id"], resp.text)
+
+    digest = body_hash(resp.text)
+    if entry and entry.get("sha256") == digest:
+        # Contenuto identico: niente BeautifulSoup, si riusa il risultato salvato
+        cache.count("revalidated")
+        detail = entry["parsed"]
+    else:
+        if cache:
+            cache.count("miss")
+        t0 = time.perf_counter()
+        detail = parse_member_html(resp.text, member, fast)
+        METRICS.record("parse", time.perf_counter() - t0, len(resp.content))
+
+    if cache:
+        cache.store(key, {
+            "member_id":     member["id"],
+            "body":          resp.text,
+            "sha256":        digest,
+            "fetched_at":    time.time(),
+            "etag":          resp.headers.get("ETag", ""),
+            "last_modified": resp.headers.get("Last-Modified", ""),
+            "parsed":        detail,
+        })
+    return detail
+
+
+def fetch_member_details(session: requests.Session, members: list, chapter: Chapter,
+                         pool: ThreadPoolExecutor, limiter: TokenBucket = None,
+                         cache: ResponseCache = None,
+                         fast: bool = False,
+                         recorder: Recorder = None,
+                         known: dict = None,
+                         retry: RetryPolicy = None,
+                         window: int = 0):
+    # Accoda subito i primi dettagli sul pool condiviso e restituisce un
+    # generatore di (meta, dettaglio, errore) nell'ordine di `members`, man mano
+    # che i risultati sono pronti. Con `window` restano in volo al più `window`
+    # richieste: il membro successivo parte quando ne esce uno, così risposte e
+    # dettagli in memoria non crescono con la lista. Le risposte servite dalla
+    # cache non consumano token del rate limit. Con `known` (aggiornamento
+    # differenziale) i membri presenti sono riusati senza richieste, gli altri
+    # sono sempre rivalidati.
+    def job(meta):
+        with METRICS.thread_profile():
+            return fetch_member_detail(session, meta, chapter, cache=cache, limiter=limiter,
+                                       fast=fast, recorder=recorder,
+                                       revalidate=known is not None, retry=retry)
+
+    def submit(meta):
+        return meta, None if known and meta["id"] in known else pool.submit(job, meta)
+
+    pending = iter(members)
+    queue   = collections.deque(map(submit, itertools.islice(pending, window or None)))
+
+    def results():
+        while queue:
+            meta, fut = queue.popleft()
+            nxt = next(pending, None)
+            if nxt is not None:
+                queue.append(submit(nxt))
+            if fut is None:
+                yield meta, known[meta["id"]], None
+                continue
+            try:
+                yield meta, fut.result(), None
+            except Exception as e:
+                yield meta, None, e
+
+    return results()
+
+
+# ─── Immagini ──────────────────────────────────────────────────────────────────
+
+class ImageStore:
+    """
+    Scarica foto e loghi in IMAGES_DIR, con nomi derivati dallo sha256 del
+    file originale. Un manifest tiene ETag/Last-Modified e le varianti già
+    generate per ogni URL: le immagini invariate non vengono né riscaricate
+    né rielaborate. I download vanno al CDN, non al portale: non consumano il
+    rate limit dei dettagli ma hanno un proprio tetto di IMAGE_WORKERS.
+    """
+
+    def __init__(self, session: requests.Session, directory: str = IMAGES_DIR,
+                 workers: int = IMAGE_WORKERS):
+        import_images()
+        self.session   = session
+        self.slots     = threading.BoundedSemaphore(max(1, workers))
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.used  = {}
+        self.lock  = threading.Lock()
+        self.stats = {"downloaded": 0, "unchanged": 0, "failed": 0}
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _count(self, kind: str):
+        with self.lock:
+            self.stats[kind] += 1
+        METRICS.count(f"image_{kind}")
+
+    def _complete(self, entry: dict) -> bool:
+        # Varianti della versione corrente, tutte presenti su disco
+        return entry.get("version") == IMAGE_VERSION and all(os.path.exists(os.path.join(self.directory, name))
+                   for files in entry.get("files", {}).values() for name in files.values())
+
+    def fetch(self, url: str, kind: str) -> dict:
+        entry   = self.manifest.get(url)
+        headers = {}
+        if entry and entry.get("kind") == kind and self._complete(entry):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        else:
+            entry = None
+
+        with self.slots:
+            t0 = time.perf_counter()
+            resp = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        METRICS.record("image_fetch", time.perf_counter() - t0, len(resp.content))
+
+        if resp.status_code == 304 and entry:
+            self._count("unchanged")
+        else:
+            resp.raise_for_status()
+            sha = hashlib.sha256(resp.content).hexdigest()
+            if entry and entry["sha256"] == sha:
+                self._count("unchanged")
+            else:
+                t0 = time.perf_counter()
+                entry = self._process(resp.content, sha, kind)
+                METRICS.record("image_resize", time.perf_counter() - t0, len(resp.content))
+                self._count("downloaded")
+            entry["etag"]          = resp.headers.get("ETag", "")
+            entry["last_modified"] = resp.headers.get("Last-Modified", "")
+
+        with self.lock:
+            self.used[url] = entry
+        return entry
+
+    def _process(self, data: bytes, sha: str, kind: str) -> dict:
+        img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+        if kind == "photo":
+            fallback = "jpg"
+            img = img.convert("RGB")
+            boxes = {s: (AVATAR_SIZE * s, AVATAR_SIZE * s) for s in (1, 2)}
+        else:
+            fallback = "png"
+            img = img.convert("RGBA")
+            boxes = {s: (img.width * LOGO_HEIGHT * s / img.height, LOGO_HEIGHT * s)
+                     for s in (1, 2)}
+        # Mai più grandi dell'originale: la 1x si ferma alla misura della sorgente
+        # (stesse proporzioni del riquadro), le densità che la supererebbero non
+        # si generano affatto
+        sizes = {}
+        for scale, (w, h) in boxes.items():
+            ratio = min(1, img.width / w, img.height / h)
+            if ratio < 1 and scale > 1:
+                break
+            sizes[scale] = (max(1, round(w * ratio)), max(1, round(h * ratio)))
+
+        files = {"webp": {}, fallback: {}}
+        for scale, (w, h) in sizes.items():
+            if kind == "photo":
+                out = ImageOps.fit(img, (w, h), Image.LANCZOS)
+            else:
+                out = img.resize((w, h), Image.LANCZOS)
+            for fmt in ("webp", fallback):
+                name = f"{sha[:16]}-{w}x{h}.{fmt}"
+                path = os.path.join(self.directory, name)
+                if not os.path.exists(path):
+                    opts = {"quality": IMAGE_QUALITY, "method": 6} if fmt == "webp" else \
+                           {"quality": IMAGE_QUALITY, "optimize": True, "progressive": True} \
+                           if fmt == "jpg" else {"optimize": True}
+                    tmp = f"{path}.{threading.get_ident()}.tmp"
+                    out.save(tmp, format={"jpg": "JPEG"}.get(fmt, fmt.upper()), **opts)
+                    os.replace(tmp, path)
+                files[fmt][str(scale)] = name
+        return {"sha256": sha, "kind": kind, "version": IMAGE_VERSION,
+                "width": sizes[1][0], "height": sizes[1][1],
+                "fallback": fallback, "files": files}
+
+    def fetch_all(self, details: list, pool: ThreadPoolExecutor) -> dict:
+        # Scarica in parallelo foto/loghi dei membri: {url: voce manifest}. Gli URL
+        # già elaborati in un lotto precedente non si riscaricano. Senza sessione
+        # (fase `render`) si usano le sole miniature già presenti
+        if self.session is None:
+            return self.cached(details)
+        jobs, found = {}, {}
+        for d in details:
+            for field, kind in (("photo", "photo"), ("company_logo", "logo")):
+                url = d.get(field)
+                if not url or url in jobs or url in found:
+                    continue
+                if url in self.used:
+                    found[url] = self.used[url]
+                else:
+                    jobs[url] = pool.submit(self._safe_fetch, url, kind)
+        found.update({url: fut.result() for url, fut in jobs.items() if fut.result()})
+        return found
+
+    def restore(self, entries: dict):
+        # Voci usate da un'esecuzione interrotta (vedi PageBuild): le miniature
+        # delle card già scritte restano nel manifest e non vengono potate
+        with self.lock:
+            self.used.update(entries)
+
+    def cached(self, details: list) -> dict:
+        found = {}
+        for d in details:
+            for field in ("photo", "company_logo"):
+                entry = self.manifest.get(d.get(field) or "")
+                if entry and self._complete(entry):
+                    found[d[field]] = self.used[d[field]] = entry
+        return found
+
+    def _safe_fetch(self, url: str, kind: str):
+        # Un'immagine non scaricata o non leggibile tiene le miniature
+        # dell'esecuzione precedente, se ci sono: restano nel manifest e su disco
+        try:
+            return self.fetch(url, kind)
+        except Exception as e:
+            self._count("failed")
+            print(f"   ⚠️  immagine {url[:60]}: {e}")
+        entry = self.manifest.get(url)
+        if entry and entry.get("kind") == kind and self._complete(entry):
+            with self.lock:
+                self.used[url] = entry
+            return entry
+        return None
+
+    def view(self, entry: dict, root: str) -> dict:
+        # Attributi pronti per render_card(), con percorsi relativi alla pagina
+        def path(name):
+            return f"{root}{self.directory}/{name}"
+
+        def srcset(fmt):
+            return ", ".join(f"{path(n)} {s}x" for s, n in sorted(entry["files"][fmt].items()))
+
+        return {
+            "src":    path(entry["files"][entry["fallback"]]["1"]),
+            "srcset": srcset(entry["fallback"]),
+            "webp":   srcset("webp"),
+            "width":  entry["width"],
+            "height": entry["height"],
+        }
+
+    def save(self, prune: bool = True):
+        # Con `prune` il manifest tiene i soli URL usati da questa esecuzione
+        # (comprese le voci precedenti di quelli falliti, vedi _safe_fetch()) e i
+        # file non più referenziati vengono rimossi; altrimenti si aggiunge al
+        # manifest esistente
+        entries = dict(self.used) if prune else {**self.manifest, **self.used}
+        if prune:
+            keep = {n for e in entries.values() for files in e["files"].values()
+                    for n in files.values()}
+            for name in os.listdir(self.directory):
+                if name != "manifest.json" and name not in keep:
+                    os.remove(os.path.join(self.directory, name))
+        atomic_write(self.manifest_path, json.dumps(entries, indent=1, sort_keys=True) + "\n")
+
+
+# ─── Font ──────────────────────────────────────────────────────────────────────
+
+FONT_FACE_RE = re.compile(r"/\*\s*([\w-]+)\s*\*/\s*@font-face\s*{([^}]*)}")
+
+
+def vendor_fonts(session: requests.Session, directory: str = FONTS_DIR) -> list:
+    # Restituisce le @font-face locali, scaricandole da Google Fonts solo la
+    # prima volta (poi restano versionate in `directory`)
+    manifest = os.path.join(directory, "fonts.json")
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    print(f"🔤  Scarico i font in {directory}/ ...")
+    # Con uno User-Agent moderno Google Fonts risponde con WOFF2 divisi per sottoinsieme
+    css = session.get(FONTS_CSS_URL, headers={"User-Agent": SESSION_HEADERS["User-Agent"]},
+                      timeout=REQUEST_TIMEOUT)
+    css.raise_for_status()
+    os.makedirs(directory, exist_ok=True)
+    faces = []
+    for subset, body in FONT_FACE_RE.findall(css.text):
+        if subset not in FONT_SUBSETS:
+            continue
+        prop = dict(re.findall(r"([\w-]+)\s*:\s*([^;]+);", body))
+        family = prop["font-family"].strip("'\" ")
+        style  = prop.get("font-style", "normal")
+        weight = prop.get("font-weight", "400")
+        url    = re.search(r"url\(([^)]+)\)", prop["src"]).group(1)
+        name   = f"{family.lower().replace(' ', '-')}-{weight}{'i' if style == 'italic' else ''}-{subset}.woff2"
+        data = session.get(url, timeout=REQUEST_TIMEOUT)
+        data.raise_for_status()
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data.content)
+        faces.append({"family": family, "style": style, "weight": weight, "subset": subset,
+                      "unicode_range": prop.get("unicode-range", ""), "file": name})
+    atomic_write(manifest, json.dumps(faces, indent=1) + "\n")
+    return faces
+
+
+def fonts_html(faces: list, root: str, directory: str = FONTS_DIR) -> str:
+    # Senza font locali si torna al foglio di stile di Google Fonts
+    if not faces:
+        return f'<link href="{FONTS_CSS_URL}" rel="stylesheet">'
+    preload = [
+        f'<link rel="preload" href="{root}{directory}/{f["file"]}" as="font" type="font/woff2" crossorigin>'
+        for f in faces
+        if f["subset"] == "latin" and (f["family"], f["style"], f["weight"]) in FONT_PRELOAD
+    ]
+    rules = [
+        f"@font-face{{font-family:'{f['family']}';font-style:{f['style']};"
+        f"font-weight:{f['weight']};font-display:swap;"
+        f"src:url({root}{directory}/{f['file']}) format('woff2');"
+        + (f"unicode-range:{f['unicode_range']}" if f["unicode_range"] else "") + "}"
+        for f in faces
+    ]
+    return "\n".join(preload) + "\n<style>\n" + "\n".join(rules) + "\n</style>"
 
 
 # ─── Parse ─────────────────────────────────────────────────────────────────────
@@ -153,6 +1188,10 @@ def clean_title(text: str) -> str:
 
 
 def parse_member_detail(soup: BeautifulSoup, member: dict) -> dict:
+    # Portale e pagina di dettaglio arrivano dal capitolo (vedi run_chapter())
+    base_url    = member.get("base_url", BASE_URL)
+    detail_base = member.get("detail_base",
+                             f"{base_url}/{CHAPTER_SLUG}/{LOCALE}/memberdetails")
 
     def txt(sel, default=""):
         t = soup.select_one(sel)
@@ -169,10 +1208,11 @@ def parse_member_detail(soup: BeautifulSoup, member: dict) -> dict:
                 if candidate and "Telefono" not in candidate and len(candidate) < 60:
                     name = candidate
                     break
-    if name == member["name_raw"]:
-        info_clone = BeautifulSoup(
-            str(soup.select_one(".memberProfileInfo") or ""), "html.parser"
-        )
+    info = soup.select_one(".memberProfileInfo")
+    if name == member["name_raw"] and info:
+        # Copia dell'albero (senza ri-serializzare e riparsare) da cui togliere
+        # foto, contatti e social prima di leggere la prima riga
+        info_clone = copy.copy(info)
         for u in info_clone.select(".profilephoto, .memberContactDetails, .smUrls"):
             u.decompose()
         lines = [l.strip() for l in info_clone.get_text("\n").split("\n") if l.strip()]
@@ -188,14 +1228,13 @@ def parse_member_detail(soup: BeautifulSoup, member: dict) -> dict:
            or soup.select_one(".profilephoto img"))
     if img:
         src = img.get("src", "")
-        photo = (BASE_URL + src) if src.startswith("/") else src
+        photo = (base_url + src) if src.startswith("/") else src
 
     # Professione
     profession = (txt(".widgetMemberProfileTop .specialty")
                or txt(".widgetMemberProfileTop .profession")
                or txt(".widgetMemberProfileTop .memberProfession"))
     if not profession:
-        info = soup.select_one(".memberProfileInfo")
         if info:
             lines = [l.strip() for l in info.get_text("\n", strip=True).split("\n") if l.strip()]
             profession = lines[2] if len(lines) > 2 else ""
@@ -274,7 +1313,7 @@ def parse_member_detail(soup: BeautifulSoup, member: dict) -> dict:
     logo_img = soup.select_one(".companyLogo img")
     if logo_img:
         src = logo_img.get("src", "")
-        company_logo = (BASE_URL + src) if src.startswith("/") else src
+        company_logo = (base_url + src) if src.startswith("/") else src
 
     return {
         "name":         name,
@@ -287,23 +1326,88 @@ def parse_member_detail(soup: BeautifulSoup, member: dict) -> dict:
         "bio":          bio,
         "social":       social,
         "company_logo": company_logo,
-        "detail_url":   f"{BASE_URL}/17-riviere-liguri-corsaro-nero/it/memberdetails"
-                        f"?{member['param']}={member['id']}",
+        "detail_url":   f"{detail_base}?{member['param']}={member['id']}",
     }
 
 
+def _is_detail_widget(cls) -> bool:
+    # A seconda della versione di bs4 arriva la singola classe o l'attributo intero
+    return bool(cls) and not DETAIL_WIDGETS.isdisjoint(cls.split())
+
+
+DETAIL_STRAINER = None   # SoupStrainer creato da import_parser()
+MAILTO_RE       = re.compile(r"""(?i:<a\s[^>]*?href)\s*=\s*["']?mailto:([^"'>]*)""")
+
+
+def parse_member_html(text: str, member: dict, fast: bool = False) -> dict:
+    if not fast:
+        return parse_member_detail(BeautifulSoup(text, "html.parser"), member)
+    soup   = BeautifulSoup(text, FAST_PARSER, parse_only=DETAIL_STRAINER)
+    detail = parse_member_detail(soup, member)
+    if not detail["email"]:
+        # Il link mailto può stare fuori dai widget: lo si cerca sul testo grezzo
+        m = MAILTO_RE.search(text)
+        if m:
+            detail["email"] = html.unescape(m.group(1)).strip()
+    return detail
+
+
+def _parse_job(job: tuple) -> tuple:
+    # Eseguito nei processi del pool: restituisce (dettaglio, errore) in chiaro,
+    # così un'eccezione non interrompe il lotto
+    text, member, fast = job
+    try:
+        return parse_member_html(text, member, fast), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def parse_workers(count: int, requested: int = 0) -> int:
+    # 0 = automatico: un processo ogni PARSE_POOL_MIN pagine, fino ai core disponibili
+    if requested > 0:
+        return requested
+    return max(1, min(os.cpu_count() or 1, count // PARSE_POOL_MIN))
+
+
+def parse_batch(jobs: list, workers: int = 0) -> list:
+    # [(html, meta, fast)] → [(dettaglio, errore)] nello stesso ordine di `jobs`
+    workers = parse_workers(len(jobs), workers)
+    nbytes  = sum(len(text) for text, _, _ in jobs)
+    t0 = time.perf_counter()
+    if workers == 1:
+        import_parser()
+        out = [_parse_job(job) for job in jobs]
+    else:
+        chunk = max(1, math.ceil(len(jobs) / (workers * PARSE_CHUNKS_PER_WORKER)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=import_parser) as pool:
+            out = list(pool.map(_parse_job, jobs, chunksize=chunk))
+    METRICS.record("parse_batch", time.perf_counter() - t0, nbytes)
+    METRICS.count("parse_workers", workers)
+    return out
+
+
+# ─── Escape HTML ───────────────────────────────────────────────────────────────
+
+def unsafe(text: str) -> bool:
+    # Il controllo con `in` è una scansione C a memchr per carattere
+    return "&" in text or "<" in text or ">" in text or '"' in text
+
+
+def esc(value: str) -> str:
+    # L'unico escape HTML delle pagine, per testo e attributi tra virgolette
+    # doppie: i valori senza caratteri speciali (quasi tutti) tornano così come
+    # sono, senza copie
+    if not value:
+        return ""
+    if unsafe(value):
+        return (value.replace("&", "&amp;").replace("<", "&lt;")
+                     .replace(">", "&gt;").replace('"', "&quot;"))
+    return value
+
+
 # ─── HTML ──────────────────────────────────────────────────────────────────────
 
-HTML_HEAD = """<!DOCTYPE html>
-<html lang="it">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>BNI Ventimiglia – Corsaro Nero | Membri</title>
-<link href="https://fonts.googleapis.com/css2?family=Playfair+Display:ital,wght@0,700;1,400&family=Lato:wght@300;400;700;900&display=swap" rel="stylesheet">
-<link rel="icon" type="image/png" href="./img/bni_favicon_without_background.png">
-<link rel="apple-touch-icon" href="./img/bni_favicon_without_background.png">
-<style>
+HTML_STYLE = """<style>
 :root{
   --red:#E2001A;--dark-red:#B5001A;--white:#fff;--off-white:#f7f7f7;--gray:#555;--border:#e0e0e0;
   --hero-right-bg:#E2001A;
@@ -476,6 +1580,8 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
 .card-company-row{display:flex;align-items:center;gap:10px}
 .card-company{font-weight:700;font-size:.95rem;color:var(--red)}
 .card-company-logo{height:28px;width:auto;object-fit:contain;border-radius:3px;flex-shrink:0}
+.card-company-logo.remote{width:84px;object-position:left center}
+.card-header picture,.card-company-row picture{display:contents}
 .card-address{font-size:.8rem;color:#888}
 .card-bio{font-size:.85rem;color:#555;line-height:1.6;flex:1}
 .card-footer{
@@ -486,7 +1592,8 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
 .card-phone:hover{text-decoration:underline}
 .card-email{font-size:.82rem;color:var(--gray);text-decoration:none;word-break:break-all}
 .card-social-row{display:flex;gap:6px;align-items:center;margin-left:2px}
-.card-social img{opacity:.75;transition:opacity .2s}.card-social:hover img{opacity:1}
+.card-social img,.card-social svg{opacity:.75;transition:opacity .2s}
+.card-social:hover img,.card-social:hover svg{opacity:1}
 .card-detail-link{
   margin-left:auto;font-size:.78rem;color:var(--red);text-decoration:none;
   border:1px solid var(--red);padding:3px 9px;border-radius:3px;white-space:nowrap;
@@ -497,6 +1604,23 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
 .site-footer{background:#111;color:rgba(255,255,255,.6);text-align:center;padding:30px 20px;font-size:.82rem}
 .site-footer strong{color:#fff}
 
+/* ── RICERCA ── */
+.member-search{max-width:1200px;margin:32px auto -28px;padding:0 24px;display:flex;align-items:center;gap:16px}
+.member-search input{
+  flex:1;font:inherit;font-size:1rem;padding:12px 16px;border:1px solid var(--border);
+  border-radius:4px;outline:none;
+}
+.member-search input:focus{border-color:var(--red)}
+.member-search-info{font-size:.85rem;color:#777;white-space:nowrap}
+.member-card[hidden]{display:none}
+
+/* ── DETTAGLI DIFFERITI ── */
+.card-more-btn{
+  font:inherit;font-size:.8rem;font-weight:700;color:var(--red);background:none;cursor:pointer;
+  border:1.5px solid var(--red);border-radius:3px;padding:5px 12px;margin-left:auto;
+}
+.card-more-btn:hover{background:var(--red);color:#fff}
+
 /* ── RESPONSIVE ── */
 @media(max-width:750px){
   .hero{flex-direction:column;min-height:auto}
@@ -508,10 +1632,21 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
   .cta-bar{flex-direction:column;align-items:flex-start;padding:20px 24px}
   .members-container{grid-template-columns:1fr}
 }
-</style>
+</style>"""
+
+HTML_HEAD = Template("""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>BNI ${city} – ${name} | Membri</title>
+${fonts}
+<link rel="icon" type="image/png" href="${root}img/bni_favicon_without_background.png">
+<link rel="apple-touch-icon" href="${root}img/bni_favicon_without_background.png">
+""" + HTML_STYLE + """
 </head>
 <body>
-
+${sprite}
 <!-- ═══════════════════════════════════════════════ HERO ══ -->
 <section class="hero">
 
@@ -523,10 +1658,10 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
             Se non esiste, viene mostrato il testo di fallback.
     -->
     <img class="bni-logo-large"
-         src="./img/bni_logo.png"
+         src="${root}img/bni_logo.png"
          alt="BNI – Business Networking International"
          onerror="this.style.display='none'">
-    <div class="chapter-badge">Capitolo Corsaro Nero</div>
+    <div class="chapter-badge">Capitolo ${name}</div>
   </div>
 
   <!-- Destra: copy + mission + tagline -->
@@ -557,9 +1692,8 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
 
 <!-- Info riunione -->
 <div class="hero-footer">
-  <strong>BNI VENTIMIGLIA &ndash; Capitolo Corsaro Nero</strong><br>
-  INCONTRO SETTIMANALE: Ogni venerd&igrave; ore 7:00<br>
-  Ristorante Palo Santo &ndash; Passeggiata G. Marconi, 5/48-49 &ndash; Ventimiglia (IM), 18039
+  <strong>BNI ${city_upper} &ndash; Capitolo ${name}</strong><br>
+  ${meeting}
 </div>
 
 <!-- ═══════════════════════════ TASTO "VIENI A TROVARCI" ══ -->
@@ -567,7 +1701,7 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
   <div class="cta-bar-text">
     Vuoi scoprire come funziona BNI? Partecipa come ospite alla nostra prossima riunione.
   </div>
-  <a class="btn-bni" href="https://bni-riviereliguri.it/17-riviere-liguri-corsaro-nero/it/visitorregistration?chapterId=36677" target="_blank">
+  <a class="btn-bni" href="${visit_url}" target="_blank">
     Vieni a trovarci! <span class="btn-arrow">&#8594;</span>
   </a>
 </div>
@@ -577,133 +1711,2044 @@ body{font-family:'Lato',sans-serif;background:var(--off-white);color:#222}
   <h2>I Nostri Membri</h2>
   <p>Professionisti e imprenditori del territorio che fanno rete ogni settimana</p>
 </div>
+${search}<div class="members-container">
+""")
+
+HTML_FOOT = Template("""
+</div>
+<footer class="site-footer">
+  <strong>BNI ${city} &ndash; Capitolo ${name}</strong><br>
+  ${changelog}&copy; 2025 BNI Global LLC. All Rights Reserved.
+</footer>
+${scripts}</body>
+</html>
+""")
+
+# Icone social in un unico sprite SVG inline (--self-host), referenziate con <use>
+SOCIAL_SPRITE = """<svg xmlns="http://www.w3.org/2000/svg" style="display:none">
+<symbol id="ico-facebook" viewBox="0 0 24 24"><rect width="24" height="24" rx="4" fill="#1877F2"/><path fill="#fff" d="M13.4 21v-7h2.4l.4-2.8h-2.8V9.4c0-.8.2-1.4 1.4-1.4h1.5V5.6c-.3 0-1.1-.1-2.2-.1-2.2 0-3.6 1.3-3.6 3.7v2H8.1V14h2.4v7z"/></symbol>
+<symbol id="ico-linkedin" viewBox="0 0 24 24"><rect width="24" height="24" rx="4" fill="#0A66C2"/><circle cx="7" cy="7.2" r="1.7" fill="#fff"/><path fill="#fff" d="M5.6 9.6h2.8V19H5.6zm4.6 0h2.7v1.3c.4-.7 1.3-1.5 2.8-1.5 3 0 3.5 1.9 3.5 4.4V19h-2.8v-4.6c0-1.1 0-2.5-1.5-2.5s-1.8 1.2-1.8 2.4V19h-2.9z"/></symbol>
+<symbol id="ico-instagram" viewBox="0 0 24 24"><rect width="24" height="24" rx="6" fill="#E4405F"/><rect x="5" y="5" width="14" height="14" rx="4" fill="none" stroke="#fff" stroke-width="1.8"/><circle cx="12" cy="12" r="3.3" fill="none" stroke="#fff" stroke-width="1.8"/><circle cx="16.3" cy="7.7" r="1.1" fill="#fff"/></symbol>
+<symbol id="ico-website" viewBox="0 0 24 24"><g fill="none" stroke="#555" stroke-width="1.6"><circle cx="12" cy="12" r="9.2"/><ellipse cx="12" cy="12" rx="4" ry="9.2"/><path d="M3 12h18M4.3 7.5h15.4M4.3 16.5h15.4"/></g></symbol>
+</svg>"""
+
+SOCIAL_ICONS = {
+    "facebook":  ("https://www.google.com/s2/favicons?domain=facebook.com",  "Facebook"),
+    "linkedin":  ("https://www.google.com/s2/favicons?domain=linkedin.com",   "LinkedIn"),
+    "instagram": ("https://www.google.com/s2/favicons?domain=instagram.com",  "Instagram"),
+    "website":   ("https://www.google.com/s2/favicons?domain=google.com",     "Sito web"),
+}
+
+# Indice aggregato dei capitoli (modalità --config)
+INDEX_HEAD = Template("""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>BNI – Capitoli | Membri</title>
+${fonts}
+<link rel="icon" type="image/png" href="${root}img/bni_favicon_without_background.png">
+""" + HTML_STYLE + """
+</head>
+<body>
+<div class="section-header">
+  <h2>I Nostri Capitoli</h2>
+  <p>${total} membri in ${count} capitoli</p>
+</div>
 <div class="members-container">
-"""
+""")
+
+INDEX_FOOT = Template("""
+</div>
+<footer class="site-footer">
+  &copy; 2025 BNI Global LLC. All Rights Reserved.
+</footer>
+${scripts}</body>
+</html>
+""")
 
-HTML_FOOT = """
+# Pagina dei cambiamenti (--history)
+CHANGELOG_PAGE = Template("""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>BNI ${city} – ${name} | Cambiamenti</title>
+${fonts}
+<link rel="icon" type="image/png" href="${root}img/bni_favicon_without_background.png">
+""" + HTML_STYLE + """<style>
+.changelog{max-width:760px;margin:0 auto;padding:40px 20px 60px}
+.changelog h3{font-family:'Playfair Display',serif;margin:28px 0 10px;color:var(--red)}
+.changelog ul{list-style:none;background:#fff;border:1px solid var(--border);border-radius:8px}
+.changelog li{padding:10px 16px;border-top:1px solid var(--border);font-size:.92rem}
+.changelog li:first-child{border-top:0}
+.changelog li.joined::before{content:"+ ";color:#1a8f3c;font-weight:900}
+.changelog li.left::before{content:"\\2212  ";color:var(--red);font-weight:900}
+.changelog li.changed::before{content:"\\21BB  ";color:var(--gray)}
+.changelog .back{display:inline-block;margin-top:30px;color:var(--red)}
+</style>
+</head>
+<body>
+<div class="section-header">
+  <h2>Nuovi membri e cambiamenti</h2>
+  <p>Capitolo ${name} &ndash; ultimi ${days} giorni</p>
+</div>
+<div class="changelog">
+${body}
+<a class="back" href="${page}">&larr; Tutti i membri</a>
 </div>
 <footer class="site-footer">
-  <strong>BNI Ventimiglia &ndash; Capitolo Corsaro Nero</strong><br>
+  <strong>BNI ${city} &ndash; Capitolo ${name}</strong><br>
   &copy; 2025 BNI Global LLC. All Rights Reserved.
 </footer>
 </body>
 </html>
-"""
+""")
+
+
+def page_root(output: str) -> str:
+    # Percorso relativo dalla pagina alla radice del sito (img/, fonts/, ...)
+    root = os.path.relpath(".", os.path.dirname(output) or ".").replace(os.sep, "/")
+    return "./" if root == "." else root + "/"
+
+
+def page_vars(chapter: Chapter, fonts: list = None, sprite: bool = False,
+              search: bool = False, lazy: bool = False, history: bool = False,
+              worker: bool = False) -> dict:
+    # Valori per HTML_HEAD / HTML_FOOT / CHANGELOG_PAGE: testi già passati da
+    # esc(), gli altri sono frammenti HTML (`meeting` viene dalla configurazione)
+    root = page_root(chapter.output)
+    return {
+        "name":       esc(chapter.name),
+        "city":       esc(chapter.city),
+        "city_upper": esc(chapter.city.upper()),
+        "meeting":    chapter.meeting,
+        "visit_url":  esc(chapter.visit_url),
+        "root":       root,
+        "fonts":      fonts_html(fonts, root),
+        "sprite":     SOCIAL_SPRITE if sprite else "",
+        "search":     SEARCH_BOX if search else "",
+        "scripts":    ((SEARCH_SCRIPT if search else "") + (LAZY_SCRIPT if lazy else "")
+                       + (sw_register(root) if worker else "")),
+        "changelog":  (f'<a href="{CHANGELOG_FILE}">Nuovi membri e cambiamenti</a><br>\n  '
+                       if history else ""),
+    }
+
+
+def render_index(chapters: list, counts: dict, output: str, fonts: list = None,
+                 worker: bool = False) -> str:
+    root  = page_root(output)
+    cards = []
+    for c in chapters:
+        href = os.path.relpath(c.output, os.path.dirname(output) or ".").replace(os.sep, "/")
+        cards.append(f"""
+  <div class="member-card">
+    <div class="card-header">
+      <div class="card-header-info">
+        <h3><span class="card-firstname">{esc(c.name)}</span></h3>
+        <div class="card-role">{esc(c.city)}</div>
+      </div>
+    </div>
+    <div class="card-body">
+      <div class="card-company">{counts.get(c.slug, 0)} membri</div>
+    </div>
+    <div class="card-footer">
+      <a class="card-detail-link" href="{esc(href)}">Membri &#8594;</a>
+    </div>
+  </div>""")
+    head = INDEX_HEAD.substitute(root=root, fonts=fonts_html(fonts, root),
+                                 total=sum(counts.values()), count=len(chapters))
+    return head + "\n".join(cards) + INDEX_FOOT.substitute(
+        scripts=sw_register(root) if worker else "")
 
 
 # ─── Render card ───────────────────────────────────────────────────────────────
 
-def render_card(m: dict) -> str:
-    if m["photo"]:
-        avatar = (
-            f'<img class="card-avatar" src="{m["photo"]}" alt="{m["name"]}" '
-            f'onerror="this.style.display=\'none\';this.nextElementSibling.style.display=\'flex\'">'
-            f'<div class="card-avatar-placeholder" style="display:none">&#128100;</div>'
-        )
+# Card come f-string, la concatenazione più veloce di CPython: le parti costanti
+# sono nel codice compilato, i pezzi facoltativi (avatar, logo, contatti) sono
+# tre funzioni condivise dalla card completa e dagli shard di --lazy. Nomi,
+# professioni e testi arrivano già puliti dal parsing (vedi clean_title()); qui
+# si fa solo l'escape, una volta per card (card_values()).
+AVATAR_ONERROR = ('onerror="this.style.display=\'none\';'
+                  'this.nextElementSibling.style.display=\'flex\'">')
+PICTURE_ONERROR = ('onerror="this.parentNode.style.display=\'none\';'
+                   'this.parentNode.nextElementSibling.style.display=\'flex\'"></picture>')
+AVATAR_HIDDEN = '<div class="card-avatar-placeholder" style="display:none">&#128100;</div>'
+AVATAR_NONE   = '<div class="card-avatar-placeholder">&#128100;</div>'
+
+
+CARD_TEXT_FIELDS = ("name", "photo", "profession", "company", "address", "phone", "email",
+                    "bio", "company_logo", "detail_url")
+card_texts = operator.itemgetter(*CARD_TEXT_FIELDS)
+
+
+def card_values(m: dict) -> dict:
+    # Escape dei campi di testo (link social compresi) una volta per card: se
+    # nel blocco unito non c'è nessun carattere speciale (il caso comune) i
+    # valori sono già sicuri e si usa `m` senza copie, altrimenti esc() campo
+    # per campo. I frammenti qui sotto ricevono valori sicuri
+    social = m.get("social") or {}
+    if not unsafe("\x00".join((*card_texts(m), *social.values()))):
+        return m
+    v = dict(m)
+    for k in CARD_TEXT_FIELDS:
+        if v[k] and unsafe(v[k]):
+            v[k] = esc(v[k])
+    if unsafe("\x00".join(social.values())):
+        v["social"] = {k: esc(u) for k, u in social.items()}
+    return v
+
+
+# (apertura, chiusura) del link di ogni social, con icone remote e con lo sprite
+SOCIAL_LINKS = {
+    sprite: tuple((k, '<a class="card-social" href="',
+                   f'" target="_blank" title="{lbl}">'
+                   + (f'<svg width="16" height="16" role="img" aria-label="{lbl}">'
+                      f'<use href="#ico-{k}"/></svg></a>' if sprite
+                      else f'<img src="{ico}" width="16" height="16" alt="{lbl}"></a>'))
+                  for k, (ico, lbl) in SOCIAL_ICONS.items())
+    for sprite in (False, True)
+}
+
+
+def card_header(v: dict) -> tuple:
+    # (avatar, nome e cognome): la parte sopra la piega, comune a tutte le card
+    name, photo, pi = v["name"], v["photo"], v.get("photo_img")
+    if photo and pi:
+        avatar = (f'<picture><source type="image/webp" srcset="{pi["webp"]}">'
+                  f'<img class="card-avatar" src="{pi["src"]}" srcset="{pi["srcset"]}" '
+                  f'width="{pi["width"]}" height="{pi["height"]}" loading="lazy" '
+                  f'alt="{name}" {PICTURE_ONERROR}{AVATAR_HIDDEN}')
+    elif photo:
+        avatar = (f'<img class="card-avatar" src="{photo}" width="{AVATAR_SIZE}" '
+                  f'height="{AVATAR_SIZE}" loading="lazy" alt="{name}" '
+                  f'{AVATAR_ONERROR}{AVATAR_HIDDEN}')
     else:
-        avatar = '<div class="card-avatar-placeholder">&#128100;</div>'
-
-    role_txt     = m.get("profession") or ""
-    company_html = f'<div class="card-company">{m["company"]}</div>'        if m.get("company") else ""
-    address_html = f'<div class="card-address">&#128205; {m["address"]}</div>' if m.get("address") else ""
-    bio_html     = f'<div class="card-bio">{m["bio"]}</div>'                if m.get("bio")     else ""
-    logo_html    = (f'<img class="card-company-logo" src="{m["company_logo"]}" alt="logo">'
-                    if m.get("company_logo") else "")
-
-    phone_clean = re.sub(r"[\s\-\/]", "", m["phone"]) if m.get("phone") else ""
-    phone_html  = (f'<a class="card-phone" href="tel:{phone_clean}">&#128222; {m["phone"]}</a>'
-                   if m.get("phone") else "")
-    email_html  = (f'<a class="card-email" href="mailto:{m["email"]}">{m["email"]}</a>'
-                   if m.get("email") else "")
-    detail_html = (f'<a class="card-detail-link" href="{m["detail_url"]}" target="_blank">Dettagli &#8594;</a>'
-                   if m.get("detail_url") else "")
-
-    social = m.get("social", {})
-    icons = {
-        "facebook":  ("https://www.google.com/s2/favicons?domain=facebook.com",  "Facebook"),
-        "linkedin":  ("https://www.google.com/s2/favicons?domain=linkedin.com",   "LinkedIn"),
-        "instagram": ("https://www.google.com/s2/favicons?domain=instagram.com",  "Instagram"),
-        "website":   ("https://www.google.com/s2/favicons?domain=google.com",     "Sito web"),
-    }
-    social_links = [
-        f'<a class="card-social" href="{social[k]}" target="_blank" title="{lbl}">'
-        f'<img src="{ico}" width="16" height="16" alt="{lbl}"></a>'
-        for k, (ico, lbl) in icons.items() if social.get(k)
-    ]
-    social_html = ('<div class="card-social-row">' + "".join(social_links) + '</div>'
-                   if social_links else "")
-
-    raw_name   = m["name"].strip()
-    clean_name = re.sub(r"^(Mr\.?|Mrs\.?|Ms\.?|Dr\.?|Prof\.?|Sig\.?|Sig\.ra\.?)\s+",
-                        "", raw_name, flags=re.I).strip()
-    parts = clean_name.split()
-    first_name = parts[0] if parts else clean_name
-    last_name  = " ".join(parts[1:]) if len(parts) > 1 else ""
-
-    name_html = (
-        f'<h3>'
-        f'<span class="card-firstname">{first_name}</span>'
-        + (f' <span class="card-lastname">{last_name}</span>' if last_name else "")
-        + '</h3>'
+        avatar = AVATAR_NONE
+    first, _, last = name.strip().partition(" ")
+    if not last:
+        return avatar, f'<h3><span class="card-firstname">{first}</span></h3>'
+    return avatar, (f'<h3><span class="card-firstname">{first}</span> '
+                    f'<span class="card-lastname">{" ".join(last.split())}</span></h3>')
+
+
+def card_logo(v: dict) -> str:
+    logo, li = v["company_logo"], v.get("logo_img")
+    if logo and li:
+        return (f'<picture><source type="image/webp" srcset="{li["webp"]}">'
+                f'<img class="card-company-logo" src="{li["src"]}" '
+                f'srcset="{li["srcset"]}" width="{li["width"]}" height="{li["height"]}" '
+                f'loading="lazy" alt="logo"></picture>')
+    if logo:
+        # Logo remoto (senza --images o non localizzato): proporzioni ignote,
+        # riquadro fisso con il logo contenuto, così lo spazio è riservato
+        return (f'<img class="card-company-logo remote" src="{logo}" '
+                f'width="{LOGO_BOX}" height="{LOGO_HEIGHT}" loading="lazy" alt="logo">')
+    return ""
+
+
+def card_extras(v: dict, sprite: bool = False) -> tuple:
+    # (indirizzo, bio, telefono, email, social, link ai dettagli): ciò che --lazy
+    # toglie dalla pagina insieme al logo
+    address, bio, phone, email, url = (v["address"], v["bio"], v["phone"], v["email"],
+                                       v["detail_url"])
+    # Numero per tel: senza spazi, trattini e barre
+    tel = phone and "".join(phone.replace("-", "").replace("/", "").split())
+    social, links = v.get("social"), []
+    if social:
+        for k, head, tail in SOCIAL_LINKS[bool(sprite)]:
+            if url_ := social.get(k):
+                links += (head, url_, tail)
+    return (
+        f'<div class="card-address">&#128205; {address}</div>' if address else "",
+        f'<div class="card-bio">{bio}</div>' if bio else "",
+        f'<a class="card-phone" href="tel:{tel}">&#128222; {phone}</a>' if phone else "",
+        f'<a class="card-email" href="mailto:{email}">{email}</a>' if email else "",
+        f'<div class="card-social-row">{"".join(links)}</div>' if links else "",
+        f'<a class="card-detail-link" href="{url}" target="_blank">Dettagli &#8594;</a>'
+        if url else "",
     )
 
+
+def render_card(m: dict, sprite: bool = False, shard: tuple = None) -> str:
+    v = card_values(m)
+    avatar, title = card_header(v)
+    company = f'<div class="card-company">{v["company"]}</div>' if v["company"] else ""
+    if shard:
+        # --lazy: solo ciò che sta sopra la piega; logo, bio e contatti arrivano
+        # dalla voce shard[1] dello shard JSON shard[0] (vedi card_details())
+        return f"""
+  <div class="member-card" data-shard="{shard[0]}" data-k="{shard[1]}">
+    <div class="card-header">
+      {avatar}
+      <div class="card-header-info">
+        {title}
+        <div class="card-role">{v["profession"]}</div>
+      </div>
+    </div>
+    <div class="card-body">
+      <div class="card-company-row">{company}</div>
+    </div>
+    <div class="card-footer">
+      <button class="card-more-btn" type="button" aria-expanded="false">Contatti e dettagli &#8595;</button>
+    </div>
+  </div>"""
+
+    address, bio, phone, email, social, link = card_extras(v, sprite)
     return f"""
   <div class="member-card">
     <div class="card-header">
       {avatar}
       <div class="card-header-info">
-        {name_html}
-        <div class="card-role">{role_txt}</div>
+        {title}
+        <div class="card-role">{v["profession"]}</div>
       </div>
     </div>
     <div class="card-body">
-      <div class="card-company-row">{logo_html}{company_html}</div>
-      {address_html}
-      {bio_html}
+      <div class="card-company-row">{card_logo(v)}{company}</div>
+      {address}
+      {bio}
     </div>
     <div class="card-footer">
-      {phone_html}
-      {email_html}
-      {social_html}
-      {detail_html}
+      {phone}
+      {email}
+      {social}
+      {link}
     </div>
   </div>"""
 
 
+def card_details(m: dict, sprite: bool = False) -> list:
+    # [logo, resto del corpo, piè di card] che --lazy toglie dalla pagina
+    v = card_values(m)
+    address, bio, *footer = card_extras(v, sprite)
+    return [card_logo(v), address + bio, "".join(footer)]
+
+
+# ─── Ricerca ───────────────────────────────────────────────────────────────────
+
+SEARCH_BOX = f"""<div class="member-search">
+  <input id="member-search" type="search" placeholder="Cerca per nome, professione, azienda, zona&hellip;"
+         aria-label="Cerca membri" autocomplete="off" data-index="{SEARCH_FILE}">
+  <span class="member-search-info" id="member-search-info" aria-live="polite"></span>
+</div>
+"""
+
+# Filtra la griglia con le sole posting list: nessuna lettura del testo delle card.
+# L'indice si scarica al primo focus; si aggiornano solo le card che cambiano stato.
+SEARCH_SCRIPT = """<script>
+(function(){
+var q=document.getElementById('member-search'),info=document.getElementById('member-search-info'),
+    grid=document.querySelector('.members-container'),idx=null,loading=null,shown=null;
+function fold(s){return s.normalize('NFD').replace(/[\\u0300-\\u036f]/g,'').toLowerCase();}
+function decode(map){var out={};for(var k in map){var d=map[k],a=new Int32Array(d.length),v=0;
+  for(var i=0;i<d.length;i++){v+=d[i];a[i]=v;}out[k]=a;}return out;}
+function load(){if(!loading)loading=fetch(q.dataset.index).then(function(r){return r.json();})
+  .then(function(j){idx={n:j.n,p:decode(j.p),t:decode(j.t)};});return loading;}
+function and(a,b){var r=[],i=0,j=0;while(i<a.length&&j<b.length){
+  if(a[i]===b[j]){r.push(a[i]);i++;j++;}else if(a[i]<b[j])i++;else j++;}return r;}
+function lookup(w){if(w.length<=""" + str(SEARCH_PREFIX_MAX) + """)return idx.p[w]||[];var r=null;
+  for(var i=0;i+3<=w.length;i++){var p=idx.t[w.substr(i,3)];if(!p)return [];r=r?and(r,p):p;if(!r.length)break;}
+  return r;}
+function run(){var words=fold(q.value).split(/[^a-z0-9]+/).filter(Boolean),hits=null;
+  for(var k=0;k<words.length;k++){var p=lookup(words[k]);hits=hits?and(hits,p):p;if(!hits.length)break;}
+  var next=new Uint8Array(idx.n),cards=grid.children;
+  if(hits){for(var i=0;i<hits.length;i++)next[hits[i]]=1;}else next.fill(1);
+  for(var i=0;i<idx.n&&i<cards.length;i++)if(!shown||shown[i]!==next[i])cards[i].hidden=!next[i];
+  shown=next;info.textContent=hits?hits.length+(hits.length===1?' membro':' membri'):'';}
+q.addEventListener('focus',load);
+q.addEventListener('input',function(){load().then(run);});
+if(q.value)load().then(run);
+})();
+</script>
+"""
+
+
+def fold_text(text: str) -> list:
+    # Minuscolo senza accenti né markup, spezzato in parole: identico a fold() nel JS
+    text = re.sub(r"<[^>]+>", " ", html.unescape(text or ""))
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(c for c in text if not "\u0300" <= c <= "\u036f").lower()
+    return [w for w in re.split(r"[^a-z0-9]+", text) if w]
+
+
+def search_words(m: dict) -> set:
+    words = set()
+    for field in ("name", "profession", "company", "address"):
+        words.update(fold_text(m.get(field)))
+    # Della bio solo le parole più frequenti (a parità, le prime)
+    freq = {}
+    for w in fold_text(m.get("bio")):
+        if len(w) > 3 and w not in SEARCH_STOPWORDS and not w.isdigit():
+            freq[w] = freq.get(w, 0) + 1
+    words.update(sorted(freq, key=lambda w: -freq[w])[:SEARCH_BIO_KEYWORDS])
+    return words
+
+
+def build_search_index(members: list) -> dict:
+    # Posting list ordinate per posizione della card nella griglia
+    prefixes, trigrams = {}, {}
+    for i, m in enumerate(members):
+        keys_p, keys_t = set(), set()
+        for w in search_words(m):
+            keys_p.update(w[:n] for n in range(1, min(len(w), SEARCH_PREFIX_MAX) + 1))
+            keys_t.update(w[j:j + 3] for j in range(len(w) - 2))
+        for k in keys_p:
+            prefixes.setdefault(k, []).append(i)
+        for k in keys_t:
+            trigrams.setdefault(k, []).append(i)
+
+    def delta(postings: dict) -> dict:
+        return {k: [v - (p[j - 1] if j else 0) for j, v in enumerate(p)]
+                for k, p in sorted(postings.items())}
+
+    return {"v": SEARCH_VERSION, "n": len(members), "p": delta(prefixes), "t": delta(trigrams)}
+
+
+def dump_search_index(members: list) -> str:
+    return json.dumps(build_search_index(members), ensure_ascii=False,
+                      separators=(",", ":")) + "\n"
+
+
+# ─── Dettagli differiti ────────────────────────────────────────────────────────
+
+# Scarica lo shard quando la card entra in vista (o al passaggio del mouse/focus)
+# e inserisce logo, bio e contatti quando si apre la card.
+LAZY_SCRIPT = """<script>
+(function(){
+var shards={};
+function load(url){if(!shards[url])shards[url]=fetch(url).then(function(r){
+  if(!r.ok)throw new Error(r.status);return r.json();}).catch(function(e){delete shards[url];throw e;});
+  return shards[url];}
+function card(el){return el&&el.closest?el.closest('.member-card[data-shard]'):null;}
+function prefetch(e){var c=card(e.target);if(c)load(c.dataset.shard).catch(function(){});}
+function expand(c){if(c.dataset.open)return;c.dataset.open='1';
+  load(c.dataset.shard).then(function(d){var p=d.cards[+c.dataset.k];
+    c.querySelector('.card-company-row').insertAdjacentHTML('afterbegin',p[0]);
+    c.querySelector('.card-body').insertAdjacentHTML('beforeend',p[1]);
+    c.querySelector('.card-footer').innerHTML=p[2];c.removeAttribute('data-shard');
+  }).catch(function(){delete c.dataset.open;});}
+document.addEventListener('mouseover',prefetch);
+document.addEventListener('focusin',prefetch);
+document.addEventListener('click',function(e){var b=e.target.closest&&e.target.closest('.card-more-btn');
+  if(b)expand(card(b));});
+if('IntersectionObserver' in window){var io=new IntersectionObserver(function(es){es.forEach(function(en){
+  if(en.isIntersecting){io.unobserve(en.target);load(en.target.dataset.shard).catch(function(){});}});},
+  {rootMargin:'300px'});
+  document.querySelectorAll('.member-card[data-shard]').forEach(function(c){io.observe(c);});}
+})();
+</script>
+"""
+
+
+def detail_shards(members: list, sprite: bool = False, start: int = 0) -> list:
+    # [(nome file, JSON)] con i card_details() di DETAIL_SHARD_SIZE membri
+    # ciascuno, numerati da `start`
+    shards = []
+    for n in range(0, len(members), DETAIL_SHARD_SIZE):
+        cards = [card_details(m, sprite) for m in members[n:n + DETAIL_SHARD_SIZE]]
+        text  = json.dumps({"v": DETAIL_SHARD_VERSION, "cards": cards},
+                           ensure_ascii=False, separators=(",", ":")) + "\n"
+        shards.append((f"{start + n // DETAIL_SHARD_SIZE}.json", text))
+    return shards
+
+
+def shard_ref(name: str, text: str) -> str:
+    # URL relativo alla pagina, con l'hash del contenuto contro le cache del browser
+    return f"{DETAILS_DIR}/{name}?v={body_hash(text)[:10]}"
+
+
+def write_detail_shards(directory: str, shards: list) -> int:
+    os.makedirs(directory, exist_ok=True)
+    return sum(write_if_changed(os.path.join(directory, name), text) for name, text in shards)
+
+
+def prune_detail_shards(directory: str, count: int):
+    # Via gli shard oltre i primi `count` (la lista si è accorciata)
+    keep = {f"{i}.json" for i in range(count)}
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if name.endswith(".json") and name not in keep:
+            os.remove(os.path.join(directory, name))
+
+
+# ─── Minify ────────────────────────────────────────────────────────────────────
+
+RAW_BLOCK_RE   = re.compile(r"(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2>)", re.S | re.I)
+HTML_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+CSS_TOKEN_RE   = re.compile(r"""/\*.*?\*/|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'""", re.S)
+
+
+def minify_css(css: str) -> str:
+    # Le stringhe ("...", '...') restano come sono: si mettono da parte prima di
+    # compattare gli spazi e si rimettono al loro posto alla fine
+    strings = []
+
+    def stash(m):
+        if m.group(0).startswith("/*"):
+            return ""
+        strings.append(m.group(0))
+        return f"\0{len(strings) - 1}\0"
+
+    css = CSS_TOKEN_RE.sub(stash, css)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}").strip()
+    return re.sub(r"\0(\d+)\0", lambda m: strings[int(m.group(1))], css)
+
+
+def _minify_markup(markup: str) -> str:
+    markup = HTML_COMMENT_RE.sub("", markup)
+    # Spazi con a capo tra due tag = indentazione; gli altri si riducono a uno
+    markup = re.sub(r">\s*\n\s*<", "><", markup)
+    # ai bordi del frammento c'è sempre un tag (script/style/pre/textarea)
+    markup = re.sub(r"^\s*\n\s*|\s*\n\s*$", "", markup)
+    return re.sub(r"\s+", " ", markup)
+
+
+def minify_html(page: str) -> str:
+    # Script, pre e textarea restano intatti; gli <style> passano da minify_css()
+    out, pos = [], 0
+    for m in RAW_BLOCK_RE.finditer(page):
+        out.append(_minify_markup(page[pos:m.start()]))
+        body = minify_css(m.group(3)) if m.group(2).lower() == "style" else m.group(3)
+        out.append(m.group(1) + body + m.group(4))
+        pos = m.end()
+    out.append(_minify_markup(page[pos:]))
+    return "".join(out).strip() + "\n"
+
+
+def minify_chunk(markup: str) -> str:
+    # Un pezzo di pagina scritto in streaming (testa, lotto di card): stesse
+    # regole di minify_html() senza l'a capo finale. Ai bordi di ogni pezzo c'è
+    # un tag, quindi i pezzi minificati uniti danno la pagina minificata intera
+    t0 = time.perf_counter()
+    small = minify_html(markup).rstrip("\n")
+    METRICS.record("minify", time.perf_counter() - t0, len(small.encode("utf-8")))
+    return small
+
+
+def precompress(path: str) -> dict:
+    # .gz e .br della pagina pubblicata, letta a blocchi: la memoria non dipende
+    # dalla dimensione della pagina. Il gzip è deterministico (mtime=0 come
+    # gzip.compress()), così che il file cambi solo se cambia la pagina
+    sizes = {"gzip": None, "brotli": None}
+    gz = zlib.compressobj(9, zlib.DEFLATED, 31)
+    br = (brotli.Compressor(quality=11, mode=brotli.MODE_TEXT) if import_brotli()
+          else None)
+    with open(path, "rb") as src, open(path + ".gz", "wb") as out_gz, \
+            open(path + ".br", "wb") if br else nullcontext() as out_br:
+        for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+            out_gz.write(gz.compress(chunk))
+            if br:
+                out_br.write(br.process(chunk))
+        out_gz.write(gz.flush())
+        sizes["gzip"] = out_gz.tell()
+        if br:
+            out_br.write(br.finish())
+            sizes["brotli"] = out_br.tell()
+    if not br and os.path.exists(path + ".br"):
+        # Senza brotli un .br di un'esecuzione precedente resterebbe accanto
+        # alla pagina nuova e verrebbe servito al suo posto
+        os.remove(path + ".br")
+    return sizes
+
+
+def log_page_weight(path: str, raw: int, minified: int):
+    # Precomprime la pagina e ne registra i pesi in PAGE_WEIGHT_LOG
+    sizes = {"page": path, "raw": raw, "minified": minified, **precompress(path)}
+    print(f"   📦 {path}: {sizes['raw'] / 1024:.1f} KB → {sizes['minified'] / 1024:.1f} KB min, "
+          f"{sizes['gzip'] / 1024:.1f} KB gzip"
+          + (f", {sizes['brotli'] / 1024:.1f} KB brotli" if sizes["brotli"] else ""))
+    METRICS.pages.append(sizes)
+    with open(PAGE_WEIGHT_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"date": datetime.now(timezone.utc).date().isoformat(),
+                            **sizes}) + "\n")
+
+
+def publish_page(path: str, page: str, minify: bool = False) -> bool:
+    # Scrive la pagina (minificata e precompressa con --minify) se è cambiata
+    if not minify:
+        return write_if_changed(path, page)
+
+    t0 = time.perf_counter()
+    small = minify_html(page)
+    METRICS.record("minify", time.perf_counter() - t0, len(small.encode("utf-8")))
+    written = write_if_changed(path, small)
+    if written or not os.path.exists(path + ".gz"):
+        log_page_weight(path, len(page.encode("utf-8")), len(small.encode("utf-8")))
+    return written
+
+
+# ─── Build incrementale ────────────────────────────────────────────────────────
+
+def member_hash(m: dict) -> str:
+    raw = json.dumps([RENDER_VERSION, m], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Campi di parse_member_detail() riportati tali e quali nel record
+DETAIL_FIELDS = ("name", "photo", "profession", "company", "address", "phone", "email",
+                 "bio", "company_logo", "detail_url")
+SOCIAL_FIELDS = ("facebook", "linkedin", "instagram", "website")
+
+
+@dataclass(slots=True)
+class MemberRecord:
+    """Un membro dello snapshot: schema fisso, social appiattiti in campi propri."""
+    id:           str
+    hash:         str = ""
+    name:         str = ""
+    photo:        str = ""
+    profession:   str = ""
+    company:      str = ""
+    address:      str = ""
+    phone:        str = ""
+    email:        str = ""
+    bio:          str = ""
+    facebook:     str = ""
+    linkedin:     str = ""
+    instagram:    str = ""
+    website:      str = ""
+    company_logo: str = ""
+    detail_url:   str = ""
+
+    @classmethod
+    def from_detail(cls, member_id: str, detail: dict, h: str = None) -> MemberRecord:
+        social = detail.get("social") or {}
+        return cls(member_id, h or member_hash(detail),
+                   **{f: detail.get(f) or "" for f in DETAIL_FIELDS},
+                   **{k: social.get(k) or "" for k in SOCIAL_FIELDS})
+
+    @property
+    def member(self) -> dict:
+        # Il dizionario di parse_member_detail(), per render_card() e member_hash()
+        m = {f: getattr(self, f) for f in DETAIL_FIELDS}
+        m["social"] = {k: getattr(self, k) for k in SOCIAL_FIELDS if getattr(self, k)}
+        return m
+
+    def to_row(self) -> list:
+        return [getattr(self, f) for f in RECORD_FIELDS]
+
+
+RECORD_FIELDS = tuple(f.name for f in dataclass_fields(MemberRecord))
+
+
+@contextmanager
+def open_snapshot(path: str, mode: str = "r", compressed: bool = False):
+    # Testo UTF-8, gzip senza nome né data nell'intestazione: stessi membri → stessi byte
+    with open(path, mode + "b") as raw:
+        if compressed:
+            with gzip.GzipFile(fileobj=raw, mode=mode + "b", filename="", mtime=0,
+                               compresslevel=6) as gz, \
+                    io.TextIOWrapper(gz, encoding="utf-8", newline="\n") as f:
+                yield f
+        else:
+            with io.TextIOWrapper(raw, encoding="utf-8", newline="\n") as f:
+                yield f
+
+
+def legacy_snapshot(path: str) -> str:
+    # members.jsonl(.gz) → members.json, il formato delle versioni precedenti
+    return re.sub(r"\.jsonl(\.gz)?$", ".json", path)
+
+
+def iter_snapshot(path: str = SNAPSHOT_FILE):
+    # MemberRecord uno alla volta, nell'ordine della pagina; una riga per membro,
+    # quindi la memoria non dipende dalla dimensione del file
+    if path.endswith(".json") or (not os.path.exists(path)
+                                  and os.path.exists(legacy_snapshot(path))):
+        yield from _iter_legacy_snapshot(legacy_snapshot(path))
+        return
+    try:
+        with open_snapshot(path, "r", path.endswith(".gz")) as f:
+            head = json.loads(f.readline() or "{}")
+            if head.get("version") != SNAPSHOT_VERSION:
+                return
+            fields = head["fields"]
+            same   = tuple(fields) == RECORD_FIELDS
+            for line in f:
+                # Una riga troncata, non JSON o con campi mancanti o in più si
+                # salta: il membro verrà riscaricato, il resto dello snapshot vale
+                try:
+                    row = json.loads(line)
+                    if same:
+                        record = MemberRecord(*row)
+                    else:
+                        # Schema di un'altra versione: si tengono i campi ancora esistenti
+                        record = MemberRecord(**{k: v for k, v in zip(fields, row)
+                                                 if k in RECORD_FIELDS})
+                except (ValueError, TypeError):
+                    METRICS.count("snapshot_bad_rows")
+                    continue
+                yield record
+    except (OSError, ValueError, EOFError, KeyError, TypeError):
+        return
+
+
+def _iter_legacy_snapshot(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    if data.get("version") != 1:
+        return
+    for e in data.get("members", []):
+        yield MemberRecord.from_detail(e["id"], e["member"], e["hash"])
+
+
+def load_snapshot(path: str = SNAPSHOT_FILE) -> dict:
+    # {id membro: MemberRecord} dall'ultima esecuzione
+    return {r.id: r for r in iter_snapshot(path)}
+
+
+class SnapshotHashes:
+    """
+    Id e hash dei membri dell'ultimo snapshot, per sapere chi è nuovo o
+    cambiato senza tenere in memoria i record. I record completi si leggono dal
+    file solo al primo dettaglio non arrivato, per ripiegare sui dati precedenti.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        self.path    = path
+        self.hashes  = {r.id: r.hash for r in iter_snapshot(path)}
+        self.records = None
+
+    def __contains__(self, member_id: str) -> bool:
+        return member_id in self.hashes
+
+    def record(self, member_id: str) -> MemberRecord:
+        if self.records is None:
+            self.records = load_snapshot(self.path)
+        return self.records[member_id]
+
+
+SNAPSHOT_HEAD = json.dumps({"version": SNAPSHOT_VERSION, "fields": RECORD_FIELDS}) + "\n"
+
+
+def snapshot_line(r: MemberRecord) -> str:
+    return json.dumps(r.to_row(), ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def write_snapshot(path: str, records) -> bool:
+    # Scrive in streaming su un file temporaneo e lo sostituisce (in modo
+    # atomico) solo se il contenuto è cambiato
+    if path.endswith(".json"):
+        return write_if_changed(path, json.dumps({"version": 1, "members": [
+            {"id": r.id, "hash": r.hash, "member": r.member} for r in records
+        ]}, ensure_ascii=False, indent=1) + "\n")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open_snapshot(tmp, "w", path.endswith(".gz")) as f:
+        f.write(SNAPSHOT_HEAD)
+        f.writelines(map(snapshot_line, records))
+    if file_hash(tmp) == file_hash(path):
+        os.remove(tmp)
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+def file_hash(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def write_if_changed(path: str, text: str) -> bool:
+    # Riscrive il file (in modo atomico) solo se il contenuto è cambiato
+    try:
+        with open(path, encoding="utf-8") as f:
+            if body_hash(f.read()) == body_hash(text):
+                return False
+    except OSError:
+        pass
+    atomic_write(path, text)
+    return True
+
+
+class RenderCache:
+    """
+    Card HTML già renderizzate, indicizzate per hash del dizionario membro, in
+    un piccolo database SQLite: si legge solo la card che serve, così la
+    memoria non dipende dal numero di card.
+    """
+
+    def __init__(self, path: str = RENDER_CACHE_FILE, sprite: bool = False):
+        self.path   = path
+        self.sprite = sprite
+        self.stats  = {"reused": 0, "rendered": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cards "
+                          "(key TEXT PRIMARY KEY, html TEXT NOT NULL, used INTEGER NOT NULL)")
+        self.conn.execute("UPDATE cards SET used = 0")
+
+    def render(self, m: dict, h: str = None, shard: tuple = None) -> str:
+        # Le opzioni di render fanno parte della chiave
+        h = (h or member_hash(m)) + ("-sprite" if self.sprite else "")
+        if shard:
+            h += "-lazy-%s-%s" % shard
+        row = self.conn.execute("SELECT html FROM cards WHERE key = ?", (h,)).fetchone()
+        if row is None:
+            t0 = time.perf_counter()
+            html = render_card(m, self.sprite, shard)
+            METRICS.record("render", time.perf_counter() - t0, len(html.encode("utf-8")))
+            self.conn.execute("INSERT OR REPLACE INTO cards VALUES (?, ?, 1)", (h, html))
+            self.stats["rendered"] += 1
+        else:
+            html = row[0]
+            self.conn.execute("UPDATE cards SET used = 1 WHERE key = ?", (h,))
+            METRICS.count("render_reused")
+            self.stats["reused"] += 1
+        return html
+
+    def save(self):
+        # Tiene solo le card usate in questa esecuzione
+        with self.conn:
+            self.conn.execute("DELETE FROM cards WHERE used = 0")
+        self.conn.close()
+
+
+class ListState:
+    """Impronte delle righe della memberlist dell'ultima esecuzione, per capitolo."""
+
+    def __init__(self, path: str = LIST_STATE_FILE, max_age: float = DEFAULT_MAX_AGE):
+        self.path    = path
+        self.max_age = max_age
+        self.rows    = {}
+        self.next    = {}
+        self.stats   = {"unchanged": 0, "changed": 0, "new": 0, "expired": 0}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.rows = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def reusable(self, chapter: Chapter, members_meta: list, snapshot: dict) -> dict:
+        # {id: dettaglio} dei membri la cui riga non è cambiata e il cui dettaglio
+        # è stato verificato da meno di max_age secondi
+        old, now, known = self.rows.get(chapter.slug, {}), time.time(), {}
+        for meta in members_meta:
+            st, e = old.get(meta["id"]), snapshot.get(meta["id"])
+            if not st or not e:
+                reason = "new"
+            elif st["row"] != meta["row"]:
+                reason = "changed"
+            elif now - st["checked_at"] >= self.max_age:
+                reason = "expired"
+            else:
+                reason = "unchanged"
+                known[meta["id"]] = e.member
+            self.stats[reason] += 1
+            METRICS.count(f"list_{reason}")
+        return known
+
+    def track(self, chapter: Chapter, results, known: dict):
+        # Ripassa i risultati registrando le righe dei membri riusciti: chi ha
+        # lasciato il capitolo o è fallito non entra nello stato successivo
+        old  = self.rows.get(chapter.slug, {})
+        rows = self.next.setdefault(chapter.slug, {})
+        for meta, detail, err in results:
+            if err is None:
+                rows[meta["id"]] = {
+                    "row":        meta["row"],
+                    "checked_at": (old[meta["id"]]["checked_at"] if meta["id"] in known
+                                   else time.time()),
+                }
+            yield meta, detail, err
+
+    def batch_rows(self, chapter: Chapter, ids: list) -> dict:
+        # Righe registrate da track() per un lotto, da salvare nel checkpoint
+        rows = self.next.get(chapter.slug, {})
+        return {i: rows[i] for i in ids if i in rows}
+
+    def restore(self, chapter: Chapter, rows: dict):
+        # Righe dei membri già scritti da un'esecuzione interrotta (vedi PageBuild)
+        self.next.setdefault(chapter.slug, {}).update(rows)
+
+    def save(self):
+        # I capitoli non elaborati in questa esecuzione mantengono lo stato precedente
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        atomic_write(self.path, json.dumps({**self.rows, **self.next},
+                                           indent=1, sort_keys=True) + "\n")
+
+
+# ─── Build in streaming ────────────────────────────────────────────────────────
+
+def batched(items, n: int):
+    # Liste di al più n elementi da un iterabile qualsiasi (itertools.batched è del 3.12)
+    it = iter(items)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
+
+
+class PageBuild:
+    """
+    Pagina e snapshot di un capitolo scritti in streaming in BUILD_DIR: la testa
+    subito, le card a lotti man mano che sono pronte, il piede alla fine. Dopo
+    ogni lotto un checkpoint registra membri e byte già scritti (con immagini e
+    righe della memberlist di --diff); se l'esecuzione si interrompe, la
+    successiva con lo stesso elenco, la stessa cornice e le stesse opzioni delle
+    card tronca i file a quel punto e riparte dal membro successivo. finish()
+    pubblica pagina e snapshot in modo atomico.
+    """
+
+    def __init__(self, chapter: Chapter, ids: list, vars_: dict,
+                 minify: bool = False, options: tuple = ()):
+        self.chapter   = chapter
+        self.vars      = vars_
+        self.minify    = minify
+        self.directory = os.path.join(BUILD_DIR, chapter.slug)
+        self.paths = {name: os.path.join(self.directory, name)
+                      for name in ("page.html", "members.jsonl", "images.jsonl", "list.jsonl")}
+        self.state_path = os.path.join(self.directory, "checkpoint.json")
+        self.head = HTML_HEAD.substitute(vars_)
+        key = body_hash(json.dumps([RENDER_VERSION, minify, options, self.head,
+                                    HTML_FOOT.substitute(vars_), ids]))
+        self.state = {"key": key, "done": 0, "cards": 0, "shards": 0, "changed": 0,
+                      "stale": 0, "raw": 0, "offsets": {}}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["key"] == key and all(os.path.getsize(self.paths[name]) >= size
+                                           for name, size in saved["offsets"].items()):
+                self.state = saved
+        except (OSError, ValueError, KeyError):
+            pass
+        self.resumed = self.state["done"]
+        self.files   = None
+
+    def _open(self):
+        # Al primo lotto: file troncati al checkpoint, oppure nuovi con testa e
+        # intestazione dello snapshot
+        os.makedirs(self.directory, exist_ok=True)
+        if self.resumed:
+            self.files = {name: open(path, "r+b") for name, path in self.paths.items()}
+            for name, f in self.files.items():
+                f.truncate(self.state["offsets"][name])
+                f.seek(0, os.SEEK_END)
+            return
+        self.files = {name: open(path, "wb") for name, path in self.paths.items()}
+        self._page(self.head)
+        self.files["members.jsonl"].write(SNAPSHOT_HEAD.encode("utf-8"))
+
+    def _page(self, text: str, final: bool = False):
+        self.state["raw"] += len(text.encode("utf-8"))
+        if self.minify:
+            text = minify_chunk(text) + ("\n" if final else "")
+        self.files["page.html"].write(text.encode("utf-8"))
+
+    def images(self) -> dict:
+        # {url: voce manifest} delle immagini dei lotti già scritti
+        return self._entries("images.jsonl")
+
+    def list_rows(self) -> dict:
+        # {id: riga della memberlist} dei membri già scritti (--diff)
+        return self._entries("list.jsonl")
+
+    def _entries(self, name: str) -> dict:
+        # Dizionari JSON, uno per lotto, fino all'offset del checkpoint
+        entries, size = {}, self.state["offsets"].get(name, 0)
+        try:
+            with open(self.paths[name], "rb") as f:
+                for line in f:
+                    if f.tell() > size:
+                        break
+                    entries.update(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        return entries
+
+    def write(self, consumed: int, records: list, cards: list, shards: int = 0,
+              assets: dict = None, rows: dict = None):
+        # Un lotto di `consumed` membri della lista: card in coda alla pagina,
+        # record allo snapshot, immagini usate e righe della memberlist, poi il
+        # checkpoint
+        t0 = time.perf_counter()
+        if self.files is None:
+            self._open()
+        if cards:
+            self._page(("\n" if self.state["cards"] else "") + "\n".join(cards))
+        self.files["members.jsonl"].write("".join(map(snapshot_line, records)).encode("utf-8"))
+        for name, entries in (("images.jsonl", assets), ("list.jsonl", rows)):
+            if entries:
+                self.files[name].write(
+                    (json.dumps(entries, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.state["done"]   += consumed
+        self.state["cards"]  += len(cards)
+        self.state["shards"] += shards
+        for name, f in self.files.items():
+            f.flush()
+            self.state["offsets"][name] = f.tell()
+        atomic_write(self.state_path, json.dumps(self.state) + "\n")
+        METRICS.record("write", time.perf_counter() - t0,
+                       sum(len(c.encode("utf-8")) for c in cards))
+
+    def finish(self) -> bool:
+        # Piede e pubblicazione: la pagina sostituisce la precedente (stesso
+        # filesystem, quindi in modo atomico) solo se è cambiata, lo snapshot
+        # passa da write_snapshot(); poi via checkpoint e file temporanei
+        if self.files is None:
+            self._open()
+        self._page(HTML_FOOT.substitute(self.vars), final=True)
+        for f in self.files.values():
+            f.close()
+        page, output = self.paths["page.html"], self.chapter.output
+        size = os.path.getsize(page)
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        written = file_hash(page) != file_hash(output)
+        if written:
+            os.replace(page, output)
+        else:
+            os.remove(page)
+        if self.minify and (written or not os.path.exists(output + ".gz")):
+            log_page_weight(output, self.state["raw"], size)
+
+        os.makedirs(os.path.dirname(self.chapter.snapshot) or ".", exist_ok=True)
+        write_snapshot(self.chapter.snapshot, iter_snapshot(self.paths["members.jsonl"]))
+        for path in (self.state_path, self.paths["members.jsonl"], self.paths["images.jsonl"],
+                     self.paths["list.jsonl"]):
+            if os.path.exists(path):
+                os.remove(path)
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+        return written
+
+
+# ─── Storico ───────────────────────────────────────────────────────────────────
+
+def history_path(chapter: Chapter) -> str:
+    return os.path.join(os.path.dirname(chapter.snapshot), HISTORY_FILE)
+
+
+def utc_stamp(when: datetime = None) -> str:
+    return (when or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class History:
+    """
+    Storico append-only dei membri di un capitolo: una riga JSON per ogni
+    esecuzione che ha cambiato qualcosa, con i membri entrati, usciti e i campi
+    modificati (valore vecchio e nuovo). Ogni HISTORY_CHECKPOINT righe la riga
+    porta anche l'elenco completo; l'indice accanto al file conserva gli offset
+    dei checkpoint, così nessuna interrogazione rilegge più di HISTORY_CHECKPOINT
+    righe, qualunque sia la lunghezza dello storico.
+    """
+
+    def __init__(self, path: str):
+        self.path       = path
+        self.index_path = path + ".idx"
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+            if self.index.get("size") != os.path.getsize(path):
+                raise ValueError("indice non allineato allo storico")
+        except (OSError, ValueError):
+            self.index = self._scan()
+
+    def _entries(self, offset: int = 0):
+        # (offset, fine riga, voce) dal byte `offset` in poi
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return
+        with f:
+            f.seek(offset)
+            while True:
+                pos, line = f.tell(), f.readline()
+                if not line.endswith(b"\n"):
+                    return          # fine file, o riga troncata da un'interruzione
+                yield pos, f.tell(), json.loads(line)
+
+    def _scan(self) -> dict:
+        index = {"checkpoints": [], "fields": None, "since": 0, "size": 0}
+        for pos, end, e in self._entries():
+            if "members" in e:
+                index["checkpoints"].append([e["at"], pos])
+                index["fields"], index["since"] = e["fields"], 0
+            else:
+                index["since"] += 1
+            index["size"] = end
+        return index
+
+    def _checkpoint(self, at: str) -> int:
+        # Offset dell'ultimo checkpoint non successivo ad `at`
+        cps = self.index["checkpoints"]
+        i = bisect.bisect_right([c[0] for c in cps], at) - 1
+        return cps[max(i, 0)][1] if cps else 0
+
+    def roster_at(self, at: str = "9999") -> dict:
+        # {id: {campo: valore}} com'era l'elenco all'istante `at` (ISO 8601 UTC)
+        state, fields = {}, self.index["fields"]
+        for _, _, e in self._entries(self._checkpoint(at)):
+            if e["at"] > at:
+                break
+            if "members" in e:
+                fields = e["fields"]
+                state  = {row[0]: dict(zip(fields, row)) for row in e["members"]}
+                continue
+            for row in e["added"]:
+                state[row[0]] = dict(zip(fields, row))
+            for member_id, _ in e["removed"]:
+                state.pop(member_id, None)
+            for member_id, _, diff in e["changed"]:
+                state[member_id].update({f: new for f, (_, new) in diff.items()})
+        return state
+
+    def changes(self, since: str) -> list:
+        # Voci registrate da `since` in poi, dalla più vecchia
+        return [e for _, _, e in self._entries(self._checkpoint(since)) if e["at"] >= since]
+
+    def append(self, records: list, at: str = None) -> dict:
+        # Registra la differenza rispetto all'ultimo stato; None se non cambia nulla
+        fields  = [f for f in RECORD_FIELDS if f != "hash"]
+        current = {r.id: {f: getattr(r, f) for f in fields} for r in records}
+        # Alla prima esecuzione lo stato di partenza è l'elenco stesso: nessuno "entra"
+        before  = self.roster_at() if self.index["checkpoints"] else current
+        entry   = {
+            "at":      at or utc_stamp(),
+            "added":   [list(m.values()) for i, m in current.items() if i not in before],
+            "removed": [[i, m["name"]] for i, m in before.items() if i not in current],
+            "changed": [[i, m["name"], {f: [before[i].get(f, ""), v] for f, v in m.items()
+                                        if before[i].get(f, "") != v}]
+                        for i, m in current.items() if i in before and before[i] != m],
+        }
+        if self.index["checkpoints"] and not (entry["added"] or entry["removed"]
+                                              or entry["changed"]):
+            return None
+        if (not self.index["checkpoints"] or self.index["fields"] != fields
+                or self.index["since"] + 1 >= HISTORY_CHECKPOINT):
+            entry["fields"]  = fields
+            entry["members"] = [list(m.values()) for m in current.values()]
+        line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+        with open(self.path, "ab") as f:
+            pos = f.tell()
+            f.write(line)
+        if "members" in entry:
+            self.index["checkpoints"].append([entry["at"], pos])
+            self.index["fields"], self.index["since"] = fields, 0
+        else:
+            self.index["since"] += 1
+        self.index["size"] = pos + len(line)
+        atomic_write(self.index_path, json.dumps(self.index) + "\n")
+        return entry
+
+
+def render_changelog(chapter: Chapter, entries: list, output: str, fonts: list = None) -> str:
+    # Pagina con entrate, uscite e cambi di nome/professione/azienda per giorno
+    days = {}
+    for e in reversed(entries):
+        fields = e.get("fields") or [f for f in RECORD_FIELDS if f != "hash"]
+        rows   = days.setdefault(e["at"][:10], [])
+        for row in e["added"]:
+            m = dict(zip(fields, row))
+            rows.append(f'<li class="joined"><strong>{esc(m["name"])}</strong> è entrato '
+                        f'nel capitolo' + (f' &ndash; {esc(m["profession"])}'
+                                            if m.get("profession") else "") + "</li>")
+        for _, name in e["removed"]:
+            rows.append(f'<li class="left"><strong>{esc(name)}</strong> '
+                        f'ha lasciato il capitolo</li>')
+        for _, name, diff in e["changed"]:
+            for f, label in CHANGELOG_FIELDS.items():
+                if f in diff:
+                    old, new = (esc(v) or "&ndash;" for v in diff[f])
+                    rows.append(f'<li class="changed"><strong>{esc(name)}</strong>: '
+                                f'{label} {old} &rarr; {new}</li>')
+    body = "\n".join(f"<h3>{day}</h3>\n<ul>\n" + "\n".join(rows) + "\n</ul>"
+                     for day, rows in days.items() if rows)
+    vars_ = page_vars(replace(chapter, output=output), fonts)
+    return CHANGELOG_PAGE.substitute(
+        vars_, days=CHANGELOG_DAYS, page=esc(os.path.basename(chapter.output)),
+        body=body or "<p>Nessun cambiamento nel periodo.</p>")
+
+
+def update_history(chapter: Chapter, snapshot: list, fonts: list = None,
+                   minify: bool = False):
+    # Aggiunge l'esecuzione allo storico e rigenera la pagina dei cambiamenti
+    t0      = time.perf_counter()
+    history = History(history_path(chapter))
+    entry   = history.append(snapshot)
+    if entry is not None:
+        print(f"   storico: {len(entry['added'])} entrati, {len(entry['removed'])} usciti, "
+              f"{len(entry['changed'])} modificati → {history.path}")
+    since  = utc_stamp(datetime.now(timezone.utc) - timedelta(days=CHANGELOG_DAYS))
+    output = os.path.join(os.path.dirname(chapter.output), CHANGELOG_FILE)
+    page   = render_changelog(chapter, history.changes(since), output, fonts)
+    publish_page(output, page, minify)
+    METRICS.record("history", time.perf_counter() - t0, len(page.encode("utf-8")))
+
+
+# ─── Database ──────────────────────────────────────────────────────────────────
+
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (
+    slug       TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    city       TEXT NOT NULL,
+    region_id  TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    chapter      TEXT NOT NULL REFERENCES chapters(slug),
+    id           TEXT NOT NULL,
+    position     INTEGER NOT NULL,
+    hash         TEXT NOT NULL,
+    name         TEXT NOT NULL,
+    photo        TEXT NOT NULL,
+    profession   TEXT NOT NULL,
+    company      TEXT NOT NULL,
+    address      TEXT NOT NULL,
+    phone        TEXT NOT NULL,
+    email        TEXT NOT NULL,
+    bio          TEXT NOT NULL,
+    facebook     TEXT NOT NULL,
+    linkedin     TEXT NOT NULL,
+    instagram    TEXT NOT NULL,
+    website      TEXT NOT NULL,
+    company_logo TEXT NOT NULL,
+    detail_url   TEXT NOT NULL,
+    updated_at   TEXT NOT NULL,
+    PRIMARY KEY (chapter, id)
+);
+CREATE INDEX IF NOT EXISTS members_chapter    ON members(chapter, position);
+CREATE INDEX IF NOT EXISTS members_profession ON members(profession COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS members_company    ON members(company COLLATE NOCASE);
+"""
+
+# Indice full-text "external content": il testo resta solo in members, i trigger
+# tengono allineato l'indice a ogni insert/update/delete
+DB_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+    name, profession, company, address, bio,
+    content='members', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS members_ai AFTER INSERT ON members BEGIN
+    INSERT INTO members_fts(rowid, name, profession, company, address, bio)
+    VALUES (new.rowid, new.name, new.profession, new.company, new.address, new.bio);
+END;
+CREATE TRIGGER IF NOT EXISTS members_ad AFTER DELETE ON members BEGIN
+    INSERT INTO members_fts(members_fts, rowid, name, profession, company, address, bio)
+    VALUES ('delete', old.rowid, old.name, old.profession, old.company, old.address, old.bio);
+END;
+CREATE TRIGGER IF NOT EXISTS members_au AFTER UPDATE ON members BEGIN
+    INSERT INTO members_fts(members_fts, rowid, name, profession, company, address, bio)
+    VALUES ('delete', old.rowid, old.name, old.profession, old.company, old.address, old.bio);
+    INSERT INTO members_fts(rowid, name, profession, company, address, bio)
+    VALUES (new.rowid, new.name, new.profession, new.company, new.address, new.bio);
+END;
+"""
+
+
+class MemberDB:
+    """
+    Copia dei membri di tutti i capitoli in SQLite (--db), per interrogarli con
+    SQL e ricerca full-text. I capitoli elaborati si accumulano con stage() e
+    finiscono nel database con commit(), in un'unica transazione per esecuzione:
+    si aggiornano solo i membri con hash cambiato e si tolgono quelli usciti.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(DB_SCHEMA)
+        try:
+            self.conn.executescript(DB_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            print(f"⚠️  SQLite senza FTS5: {path} senza indice full-text")
+            self.fts = False
+        self.pending = []
+        self.stats   = {"upserted": 0, "unchanged": 0, "deleted": 0}
+
+    def stage(self, chapter: Chapter, records: list):
+        self.pending.append((chapter, list(records)))
+
+    def commit(self):
+        if not self.pending:
+            return
+        now     = utc_stamp()
+        columns = ("chapter", "position", *RECORD_FIELDS, "updated_at")
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:] if c != "id")
+        upsert  = (f"INSERT INTO members ({', '.join(columns)}) "
+                   f"VALUES ({', '.join('?' * len(columns))}) "
+                   f"ON CONFLICT (chapter, id) DO UPDATE SET {updates} "
+                   f"WHERE members.hash != excluded.hash OR members.position != excluded.position")
+        t0 = time.perf_counter()
+        with self.conn:
+            for chapter, records in self.pending:
+                self.conn.execute(
+                    "INSERT INTO chapters VALUES (?, ?, ?, ?, ?) ON CONFLICT (slug) DO UPDATE SET "
+                    "name = excluded.name, city = excluded.city, region_id = excluded.region_id, "
+                    "updated_at = excluded.updated_at",
+                    (chapter.slug, chapter.name, chapter.city, chapter.region_id, now))
+                changed = self.conn.executemany(upsert, [(chapter.slug, i, *r.to_row(), now)
+                                                         for i, r in enumerate(records)]).rowcount
+                self.stats["upserted"]  += changed
+                self.stats["unchanged"] += len(records) - changed
+
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (id TEXT PRIMARY KEY)")
+                self.conn.execute("DELETE FROM keep")
+                self.conn.executemany("INSERT OR IGNORE INTO keep VALUES (?)",
+                                      [(r.id,) for r in records])
+                self.stats["deleted"] += self.conn.execute(
+                    "DELETE FROM members WHERE chapter = ? AND id NOT IN (SELECT id FROM keep)",
+                    (chapter.slug,)).rowcount
+        METRICS.record("db", time.perf_counter() - t0)
+        self.pending = []
+
+    def records(self, chapter: Chapter) -> list:
+        # Membri del capitolo nell'ordine della memberlist
+        cur = self.conn.execute(
+            f"SELECT {', '.join(RECORD_FIELDS)} FROM members WHERE chapter = ? ORDER BY position",
+            (chapter.slug,))
+        return [MemberRecord(*row) for row in cur]
+
+    def search(self, query: str, limit: int = 50) -> list:
+        # (capitolo, nome, professione, azienda) per una query FTS5, per pertinenza
+        if not self.fts:
+            like = f"%{query}%"
+            return self.conn.execute(
+                "SELECT chapter, name, profession, company FROM members "
+                "WHERE name LIKE ? OR profession LIKE ? OR company LIKE ? LIMIT ?",
+                (like, like, like, limit)).fetchall()
+        return self.conn.execute(
+            "SELECT m.chapter, m.name, m.profession, m.company FROM members_fts f "
+            "JOIN members m ON m.rowid = f.rowid WHERE members_fts MATCH ? "
+            "ORDER BY bm25(members_fts) LIMIT ?", (query, limit)).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def save_db(db: MemberDB):
+    db.commit()
+    db.close()
+    st = db.stats
+    print(f"   database: {st['upserted']} aggiornati, {st['unchanged']} invariati, "
+          f"{st['deleted']} rimossi → {db.path}")
+
+
+# ─── Service worker ────────────────────────────────────────────────────────────
+
+# Registrazione nelle pagine: a caricamento finito, per non rubare banda alla prima visita
+SW_REGISTER = Template("""<script>
+if('serviceWorker' in navigator)window.addEventListener('load',function(){
+  navigator.serviceWorker.register('${root}${file}').catch(function(){});});
+</script>
+""")
+
+# Pagine e file del manifest: cache-first dalla cache della versione (in
+# background il browser scarica il nuovo sw.js, che alla build successiva
+# precarica la nuova versione e cancella le vecchie). Immagini e font non
+# precaricati: stale-while-revalidate. Il resto passa dalla rete.
+SERVICE_WORKER = Template("""// Generato da bni_scraper.py --service-worker: non modificare a mano
+var VERSION='${version}',PRECACHE='bni-precache-'+VERSION,IMAGES='${image_cache}',IMAGE_MAX=${image_max},
+    ASSETS=${assets};
+self.addEventListener('install',function(e){
+  e.waitUntil(caches.open(PRECACHE).then(function(c){
+    return c.addAll(ASSETS.map(function(u){return new Request(u,{cache:'reload'});}));
+  }).then(function(){return self.skipWaiting();}));
+});
+self.addEventListener('activate',function(e){
+  e.waitUntil(caches.keys().then(function(keys){
+    return Promise.all(keys.filter(function(k){return k.indexOf('bni-')===0&&k!==PRECACHE&&k!==IMAGES;})
+      .map(function(k){return caches.delete(k);}));
+  }).then(trim).then(function(){return self.clients.claim();}));
+});
+function trim(){return caches.open(IMAGES).then(function(c){return c.keys().then(function(keys){
+  return Promise.all(keys.slice(0,Math.max(0,keys.length-IMAGE_MAX)).map(function(k){return c.delete(k);}));});});}
+function precached(req){var url=new URL(req.url);
+  if(url.origin!==self.location.origin)return Promise.resolve(undefined);
+  if(url.pathname.slice(-1)==='/')url.pathname+='index.html';
+  return caches.open(PRECACHE).then(function(c){return c.match(url.href,{ignoreSearch:true});});}
+function revalidate(e){return caches.open(IMAGES).then(function(c){return c.match(e.request).then(function(hit){
+  var net=fetch(e.request).then(function(r){
+    if(r.ok&&r.type==='basic')e.waitUntil(c.put(e.request,r.clone()).then(trim));
+    return r;});
+  if(!hit)return net;
+  e.waitUntil(net.catch(function(){}));return hit;});});}
+self.addEventListener('fetch',function(e){
+  var req=e.request;if(req.method!=='GET')return;
+  e.respondWith(precached(req).then(function(hit){
+    if(hit)return hit;
+    var d=req.destination;
+    return d==='image'||d==='font'||d==='style'?revalidate(e):fetch(req);
+  }));
+});
+""")
+
+
+def sw_register(root: str) -> str:
+    return SW_REGISTER.substitute(root=root, file=SW_FILE)
+
+
+def site_assets(chapters: list, index_file: str = None, fonts: list = None,
+                search: bool = False, lazy: bool = False, history: bool = False) -> list:
+    # File da precaricare, relativi alla radice del sito: per ogni capitolo la
+    # pagina e ciò che questa build le mette accanto (changelog, indice di
+    # ricerca, shard), poi indice dei capitoli, font locali e immagini del guscio.
+    # File rimasti da build con altre opzioni non entrano
+    paths = []
+    for c in chapters:
+        folder  = os.path.dirname(c.output)
+        details = os.path.join(folder, DETAILS_DIR)
+        paths.append(c.output)
+        if history:
+            paths.append(os.path.join(folder, CHANGELOG_FILE))
+        if search:
+            paths.append(os.path.join(folder, SEARCH_FILE))
+        if lazy and os.path.isdir(details):
+            paths += [os.path.join(details, name) for name in sorted(os.listdir(details))
+                      if name.endswith(".json")]
+    if index_file:
+        paths.append(index_file)
+    paths += [os.path.join(FONTS_DIR, f["file"]) for f in fonts or ()]
+    paths += SW_SHELL_IMAGES
+    return [os.path.relpath(p).replace(os.sep, "/") for p in dict.fromkeys(paths)
+            if os.path.isfile(p)]
+
+
+def publish_service_worker(chapters: list, index_file: str = None, fonts: list = None,
+                           args: argparse.Namespace = None) -> bool:
+    # Manifest {percorso: sha256} e service worker con la versione derivata dal
+    # manifest: sw.js cambia (e i browser lo aggiornano) solo se cambia un file
+    t0      = time.perf_counter()
+    options = (args.search, args.lazy, args.history) if args else ()
+    files   = {path: file_hash(path)
+               for path in site_assets(chapters, index_file, fonts, *options)}
+    version = body_hash(json.dumps(files, sort_keys=True))[:12]
+    write_if_changed(ASSET_MANIFEST, json.dumps({"version": version, "files": files},
+                                                indent=1) + "\n")
+    worker  = SERVICE_WORKER.substitute(version=version, assets=json.dumps(list(files)),
+                                        image_cache=SW_IMAGE_CACHE, image_max=SW_IMAGE_MAX)
+    written = write_if_changed(SW_FILE, worker)
+    METRICS.record("sw", time.perf_counter() - t0, len(worker.encode("utf-8")))
+    print(f"📴  Service worker → {SW_FILE}  ({len(files)} file precaricati, versione {version})"
+          + ("" if written else "  – invariato"))
+    return written
+
+
 # ─── Main ──────────────────────────────────────────────────────────────────────
 
-def main():
-    output_file = "index.html"
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Scraper membri BNI → index.html")
+    p.add_argument("stage", nargs="?", default="all", choices=("all", *STAGES),
+                   help="fase da eseguire: fetch (risposte grezze in --raw-dir), parse "
+                        "(risposte → snapshot), render (snapshot → pagine) oppure tutte "
+                        "insieme senza file intermedi (default); history interroga lo "
+                        "storico di --history, query il database di --db")
+    p.add_argument("--parse-workers", type=int, default=0,
+                   help="processi per la fase parse: 0 = automatico in base a pagine e core, "
+                        "1 = nessun pool")
+    p.add_argument("--raw-dir", default=RAW_DIR,
+                   help=f"risposte grezze scritte da `fetch` e lette da `parse` "
+                        f"(default {RAW_DIR})")
+    p.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                   help=f"download paralleli dei dettagli (default {DEFAULT_WORKERS})")
+    p.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                   help=f"richieste/s massime verso il portale, 0 = nessun limite "
+                        f"(default {DEFAULT_RATE})")
+    p.add_argument("--burst", type=int, default=DEFAULT_BURST,
+                   help=f"richieste consecutive consentite senza attesa (default {DEFAULT_BURST})")
+    p.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                   help=f"nuovi tentativi per richiesta fallita, con backoff esponenziale "
+                        f"(default {DEFAULT_RETRIES})")
+    p.add_argument("--cache-dir", default=CACHE_DIR,
+                   help=f"cartella della cache delle risposte (default {CACHE_DIR})")
+    p.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL,
+                   help=f"secondi di validità di una risposta in cache (default {DEFAULT_CACHE_TTL})")
+    p.add_argument("--refresh", action="store_true",
+                   help="ignora la cache e riscarica tutti i dettagli")
+    p.add_argument("--no-cache", action="store_true",
+                   help="non leggere né scrivere la cache su disco")
+    p.add_argument("--diff", action="store_true",
+                   help="aggiornamento differenziale: scarica solo i dettagli dei membri "
+                        "nuovi o con la riga della lista cambiata")
+    p.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE,
+                   help=f"con --diff, secondi dopo i quali un dettaglio viene comunque "
+                        f"riverificato (default {DEFAULT_MAX_AGE})")
+    p.add_argument("--snapshot", default=SNAPSHOT_FILE,
+                   help=f"snapshot dei membri estratti: .jsonl, .jsonl.gz compresso o .json "
+                        f"(default {SNAPSHOT_FILE})")
+    p.add_argument("--config", default=None,
+                   help="file JSON con più capitoli da generare in un'unica esecuzione")
+    p.add_argument("--images", action="store_true",
+                   help=f"scarica foto e loghi in {IMAGES_DIR} come miniature WebP/JPEG/PNG "
+                        f"(richiede Pillow)")
+    p.add_argument("--self-host", action="store_true",
+                   help=f"font WOFF2 locali in {FONTS_DIR}/ e icone social in uno sprite SVG "
+                        f"inline: nessuna richiesta a terze parti oltre alle foto")
+    p.add_argument("--minify", action="store_true",
+                   help="minifica HTML e CSS e scrive anche .gz e .br precompressi")
+    p.add_argument("--lazy", action="store_true",
+                   help=f"nella griglia solo foto, nome, professione e azienda; logo, bio e "
+                        f"contatti caricati su richiesta da shard JSON in {DETAILS_DIR}/")
+    p.add_argument("--search", action="store_true",
+                   help=f"casella di ricerca istantanea con indice {SEARCH_FILE} accanto alla pagina")
+    p.add_argument("--history", action="store_true",
+                   help=f"registra entrate, uscite e modifiche dei membri in {HISTORY_FILE} "
+                        f"e pubblica {CHANGELOG_FILE} accanto alla pagina")
+    p.add_argument("--service-worker", action="store_true",
+                   help=f"pubblica {SW_FILE} e {ASSET_MANIFEST} alla radice del sito: pagine, "
+                        f"font e guscio precaricati, foto stale-while-revalidate, sito "
+                        f"consultabile offline")
+    p.add_argument("--days", type=float, default=30,
+                   help="fase history: cambiamenti degli ultimi DAYS giorni (default 30)")
+    p.add_argument("--at", metavar="DATE", default=None,
+                   help="fase history: elenco dei membri alla data DATE (AAAA-MM-GG)")
+    p.add_argument("--db", nargs="?", const=DB_FILE, default=None, metavar="PATH",
+                   help=f"salva i membri di tutti i capitoli in un database SQLite con indice "
+                        f"full-text (default {DB_FILE}); con la fase render la pagina viene "
+                        f"generata dal database")
+    p.add_argument("--match", metavar="QUERY", default=None,
+                   help="fase query: ricerca full-text FTS5 nel database, "
+                        "es. \"idraulico\" o \"profession:avvocato AND sanremo\"")
+    p.add_argument("--fast-parse", action="store_true",
+                   help="parsing ridotto ai widget letti, con lxml se installato")
+    p.add_argument("--base-url", default=None,
+                   help=f"portale BNI da interrogare, es. il server di fixture locale "
+                        f"(default {BASE_URL}, oppure variabile BNI_BASE_URL)")
+    p.add_argument("--record", metavar="DIR", default=None,
+                   help="salva le risposte memberlist/memberdetail in DIR come fixture "
+                        "(implica --refresh)")
+    p.add_argument("--watch", type=float, metavar="SECONDS", default=None,
+                   help="resta in esecuzione: controlla la memberlist ogni SECONDS secondi e "
+                        "aggiorna la pagina (con --diff) solo se l'elenco è cambiato")
+    p.add_argument("--metrics", default=METRICS_FILE,
+                   help=f"file JSON con tempi e byte per fase (default {METRICS_FILE})")
+    p.add_argument("--profile", metavar="DIR", default=None,
+                   help="salva in DIR profilo cProfile e allocazioni tracemalloc della pipeline")
+    return p.parse_args(argv)
+
+
+def print_metrics(report: dict, path: str):
+    print(f"\n⏱️  Tempi ({report['wall_s']:.2f}s totali) → {path}")
+    for stage, st in report["stages"].items():
+        print(f"   {stage:11s} {st['count']:4d}×  p50 {st['p50_s'] * 1000:7.1f} ms  "
+              f"p95 {st['p95_s'] * 1000:7.1f} ms  tot {st['total_s']:6.2f}s  "
+              f"{st['bytes'] / 1024:8.1f} KB")
+
+
+def member_records(results, previous: SnapshotHashes, stats: dict, total: int,
+                   start: int = 0):
+    # MemberRecord nell'ordine della lista, uno alla volta; in `stats` i contatori
+    # "changed" (nuovi/modificati) e "stale" (presi dai dati precedenti perché il
+    # dettaglio non è arrivato)
+    for i, (meta, detail, err) in enumerate(results, start + 1):
+        print(f"   [{i:02d}/{total}] {meta['name_raw'][:40]:40s}", end="", flush=True)
+        if err is not None and meta["id"] in previous:
+            # Ultimo dato valido: un'esecuzione difettosa non riduce l'elenco pubblicato
+            print(f"→ ⚠️  {err} – uso i dati precedenti")
+            METRICS.count("fallback")
+            stats["stale"] += 1
+            yield previous.record(meta["id"])
+            continue
+        if err is not None:
+            print(f"→ ⚠️  {err}")
+            continue
+        h = member_hash(detail)
+        if previous.hashes.get(meta["id"]) != h:
+            stats["changed"] += 1
+        print(f"→ {detail['name']}")
+        yield MemberRecord.from_detail(meta["id"], detail, h)
+
+
+def chapter_build(chapter: Chapter, ids: list, args: argparse.Namespace,
+                  fonts: list = None, sprite: bool = False,
+                  images: ImageStore = None) -> PageBuild:
+    # PageBuild del capitolo con le opzioni della pagina: un checkpoint lasciato
+    # da un altro elenco o da opzioni diverse non viene ripreso. La cornice
+    # (testa e piede) è nella chiave; qui le opzioni che cambiano le card
+    vars_ = page_vars(chapter, fonts, sprite, args.search, args.lazy, args.history,
+                      args.service_worker)
+    return PageBuild(chapter, ids, vars_, args.minify,
+                     (images is not None, bool(sprite), args.lazy))
+
+
+def build_chapter(build: PageBuild, members_meta: list, results, renderer: RenderCache,
+                  images: ImageStore = None, pool: ThreadPoolExecutor = None,
+                  fonts: list = None, search: bool = False, lazy: bool = False,
+                  history: bool = False, db: MemberDB = None,
+                  state: ListState = None) -> int:
+    # Consuma i risultati dei membri successivi al checkpoint di `build`,
+    # nell'ordine della lista e a lotti di CHECKPOINT_EVERY: record, immagini,
+    # shard e card di un lotto finiscono subito sui file di `build`. In memoria
+    # c'è un lotto alla volta, qualunque sia la dimensione del capitolo
+    chapter  = build.chapter
+    previous = SnapshotHashes(chapter.snapshot)
+    root     = page_root(chapter.output)
+    details_dir = os.path.join(os.path.dirname(chapter.output), DETAILS_DIR)
+    if build.resumed:
+        print(f"   ⏩ ripresa dal checkpoint: {build.resumed}/{len(members_meta)} membri "
+              f"già scritti")
+        if images:
+            images.restore(build.images())
+        if state:
+            state.restore(chapter, build.list_rows())
+
+    for batch in batched(results, CHECKPOINT_EVERY):
+        records = list(member_records(batch, previous, build.state, len(members_meta),
+                                      build.state["done"]))
+        details = [e.member for e in records]
+        assets  = images.fetch_all(details, pool) if images else {}
+        members = []
+        for e, m in zip(records, details):
+            h = e.hash
+            if m["photo"] in assets or m["company_logo"] in assets:
+                # Le miniature locali entrano nel dizionario renderizzato (e nel suo hash)
+                m, h = dict(m), None
+                if m["photo"] in assets:
+                    m["photo_img"] = images.view(assets[m["photo"]], root)
+                if m["company_logo"] in assets:
+                    m["logo_img"] = images.view(assets[m["company_logo"]], root)
+            members.append((m, h))
+
+        refs = []
+        if lazy:
+            t0 = time.perf_counter()
+            shards = detail_shards([m for m, _ in members], renderer.sprite,
+                                   build.state["shards"])
+            write_detail_shards(details_dir, shards)
+            METRICS.record("shards", time.perf_counter() - t0,
+                           sum(len(text.encode("utf-8")) for _, text in shards))
+            refs = [shard_ref(name, text) for name, text in shards]
+        cards = [renderer.render(m, h, (refs[i // DETAIL_SHARD_SIZE], i % DETAIL_SHARD_SIZE)
+                                 if lazy else None)
+                 for i, (m, h) in enumerate(members)]
+        rows = state.batch_rows(chapter, [meta["id"] for meta, _, _ in batch]) if state else None
+        build.write(len(batch), records, cards, len(refs), assets, rows)
+
+    written = build.finish()
+    # Senza --lazy non resta nessuno shard: quelli di una build precedente non
+    # sono più referenziati dalla pagina
+    prune_detail_shards(details_dir, build.state["shards"])
+
+    # Storico, database e ricerca lavorano sull'elenco intero: lo si rilegge
+    # dallo snapshot appena pubblicato solo se servono
+    snapshot = list(iter_snapshot(chapter.snapshot)) if search or history or db else None
+    removed  = len(previous.hashes.keys()
+                   - {e.id for e in (iter_snapshot(chapter.snapshot) if snapshot is None
+                                     else snapshot)})
+    if db:
+        db.stage(chapter, snapshot)
+    if search:
+        t0 = time.perf_counter()
+        index = dump_search_index([e.member for e in snapshot])
+        write_if_changed(os.path.join(os.path.dirname(chapter.output), SEARCH_FILE), index)
+        METRICS.record("search", time.perf_counter() - t0, len(index.encode("utf-8")))
+    if history:
+        update_history(chapter, snapshot, fonts, build.minify)
+
+    st = build.state
+    print(f"\n✅  Fatto! → {chapter.output}  ({st['cards']}/{len(members_meta)} membri)"
+          + ("" if written else "  – invariato, non riscritto"))
+    print(f"   membri: {st['changed']} nuovi/modificati, {removed} rimossi"
+          + (f", {st['stale']} dai dati precedenti" if st["stale"] else ""))
+    return st["cards"]
+
+
+def resolve_chapters(args: argparse.Namespace) -> tuple:
+    if args.config:
+        chapters, index_file = load_chapters(args.config)
+    else:
+        chapters, index_file = [replace(default_chapter(), snapshot=args.snapshot)], None
+    if args.base_url:
+        chapters = [replace(c, base_url=BASE_URL) for c in chapters]
+    return chapters, index_file
+
 
+def make_session(workers: int) -> requests.Session:
+    # Connessioni riusate e limitate al numero di worker
     session = requests.Session()
     session.headers.update(SESSION_HEADERS)
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(1, workers))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-    list_soup    = fetch_member_list(session)
-    members_meta = extract_member_ids(list_soup)
 
+def chapter_members(chapter: Chapter, list_soup: BeautifulSoup, quiet: bool = False) -> list:
+    # Membri della memberlist, pronti per i dettagli; se non ce ne sono si salva
+    # la lista per il debug. Poi l'albero non serve più e viene liberato
+    members_meta = extract_member_ids(list_soup, quiet)
     if not members_meta:
-        print("⚠️  Nessun membro trovato.")
-        with open("debug_list.html", "w", encoding="utf-8") as f:
+        print(f"⚠️  Nessun membro trovato. ({chapter.name})")
+        debug = ("debug_list.html" if chapter.chapter_id == CHAPTER_ID
+                 else f"debug_list_{chapter.slug}.html")
+        with open(debug, "w", encoding="utf-8") as f:
             f.write(list_soup.prettify())
-        return
-
-    cards_html = []
-    for i, meta in enumerate(members_meta, 1):
-        print(f"   [{i:02d}/{len(members_meta)}] {meta['name_raw'][:40]:40s}", end="", flush=True)
+    list_soup.decompose()
+    for meta in members_meta:
+        meta["base_url"]    = chapter.base_url
+        meta["detail_base"] = chapter.detail_base
+    return members_meta
+
+
+def site_fonts(args: argparse.Namespace, session: requests.Session = None) -> list:
+    if not args.self_host:
+        return None
+    try:
+        return vendor_fonts(session)
+    except Exception as e:
+        print(f"⚠️  Font locali non disponibili ({e}): uso Google Fonts")
+        return None
+
+
+def publish_index(chapters: list, counts: dict, index_file: str, fonts: list, minify: bool,
+                  worker: bool = False):
+    os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+    publish_page(index_file, render_index(
+        [c for c in chapters if c.slug in counts], counts, index_file, fonts, worker), minify)
+    print(f"📚  Indice capitoli → {index_file}  ({sum(counts.values())} membri)")
+
+
+def run(args: argparse.Namespace, recorder: Recorder = None, session: requests.Session = None,
+        rosters: dict = None):
+    # `rosters` ({slug: membri}) sono memberlist già scaricate (--watch): in
+    # quel caso la lista non si richiede una seconda volta
+    import_network()
+    import_parser()
+    chapters, index_file = resolve_chapters(args)
+    session = session or make_session(args.workers)
+
+    # Sessione, cache, render cache, rate limit e pool sono condivisi da tutti
+    # i capitoli: il tempo totale dipende dal numero di membri, non di capitoli
+    cache = (None if args.no_cache
+             else ResponseCache(args.cache_dir, args.cache_ttl, args.refresh))
+    renderer = RenderCache(RENDER_CACHE_FILE, sprite=args.self_host)
+    limiter  = TokenBucket(args.rate, args.burst)
+    retry    = RetryPolicy(args.retries)
+    state    = ListState(LIST_STATE_FILE, args.max_age) if args.diff else None
+    db       = MemberDB(args.db) if args.db else None
+    counts   = {}
+    images   = None
+    if args.images:
+        if not import_images():
+            print("⚠️  --images richiede Pillow (pip install Pillow): uso le immagini remote")
+        else:
+            images = ImageStore(session)
+    fonts = site_fonts(args, session)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        lists = {c.slug: pool.submit(fetch_member_list, session, c, args.fast_parse, recorder,
+                                     limiter, retry)
+                 for c in chapters if rosters is None}
+
+        jobs = []
+        for chapter in chapters:
+            if rosters is not None:
+                members_meta = rosters.get(chapter.slug)
+            else:
+                try:
+                    list_soup = lists[chapter.slug].result()
+                except Exception as e:
+                    print(f"⚠️  {chapter.name}: {e}")
+                    continue
+                members_meta = chapter_members(chapter, list_soup)
+            if not members_meta:
+                continue
+            known = (state.reusable(chapter, members_meta, load_snapshot(chapter.snapshot))
+                     if state else None)
+            # Dopo un'interruzione si scaricano solo i membri oltre il checkpoint
+            build   = chapter_build(chapter, [m["id"] for m in members_meta], args, fonts,
+                                    renderer.sprite, images)
+            results = fetch_member_details(session, members_meta[build.resumed:], chapter, pool,
+                                           limiter, cache, args.fast_parse, recorder, known,
+                                           retry, FETCH_WINDOW * max(1, args.workers))
+            if state:
+                results = state.track(chapter, results, known)
+            jobs.append((build, members_meta, results))
+
+        for build, members_meta, results in jobs:
+            if len(chapters) > 1:
+                print(f"\n🏷️  {build.chapter.name} ({build.chapter.city})")
+            counts[build.chapter.slug] = build_chapter(build, members_meta, results, renderer,
+                                                       images, pool, fonts, args.search,
+                                                       args.lazy, args.history, db, state)
+
+    renderer.save()
+    if db:
+        save_db(db)
+    if state:
+        state.save()
+        st = state.stats
+        print(f"   lista: {st['unchanged']} invariati, {st['changed']} cambiati, "
+              f"{st['new']} nuovi, {st['expired']} da riverificare")
+    if images:
+        # I capitoli non rigenerati tengono la pagina precedente: le loro
+        # miniature (dall'ultimo snapshot) non vanno potate
+        for chapter in chapters:
+            if chapter.slug not in counts:
+                images.cached([r.member for r in iter_snapshot(chapter.snapshot)])
+        images.save()
+        st = images.stats
+        print(f"   immagini: {st['downloaded']} elaborate, {st['unchanged']} invariate, "
+              f"{st['failed']} non scaricate → {images.directory}")
+    print(f"   card: {renderer.stats['rendered']} renderizzate, "
+          f"{renderer.stats['reused']} riusate")
+    if index_file:
+        publish_index(chapters, counts, index_file, fonts, args.minify, args.service_worker)
+    if args.service_worker:
+        publish_service_worker(chapters, index_file, fonts, args)
+    if cache:
+        st = cache.stats
+        print(f"   cache: {st['hit']} riusati, {st['revalidated']} invariati, "
+              f"{st['miss']} scaricati")
+
+
+def stage_fetch(args: argparse.Namespace):
+    # Fase 1: risposte grezze di memberlist e dettagli in args.raw_dir. Un
+    # dettaglio non scaricato lascia al suo posto la risposta precedente
+    import_network()
+    import_parser()
+    chapters, _ = resolve_chapters(args)
+    session  = make_session(args.workers)
+    limiter  = TokenBucket(args.rate, args.burst)
+    retry    = RetryPolicy(args.retries)
+    recorder = Recorder(args.raw_dir)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for chapter in chapters:
+            try:
+                list_soup = fetch_member_list(session, chapter, args.fast_parse, recorder,
+                                              limiter, retry)
+            except Exception as e:
+                print(f"⚠️  {chapter.name}: {e}")
+                continue
+            members_meta = chapter_members(chapter, list_soup)
+            futures = [pool.submit(fetch_member_raw, session, meta, chapter, limiter, retry)
+                       for meta in members_meta]
+            saved = 0
+            for meta, fut in zip(members_meta, futures):
+                try:
+                    recorder.save_detail(meta["id"], fut.result())
+                    saved += 1
+                except Exception as e:
+                    print(f"   ⚠️  {meta['name_raw'][:40]}: {e}")
+            print(f"📥  {saved}/{len(members_meta)} dettagli → {args.raw_dir}")
+
+
+def stage_parse(args: argparse.Namespace):
+    # Fase 2: dalle risposte grezze agli snapshot dei membri, senza rete. Le
+    # pagine di tutti i capitoli vanno in un unico lotto al pool di processi
+    import_parser()
+    chapters, _ = resolve_chapters(args)
+    batches, jobs = [], []
+    for chapter in chapters:
         try:
-            detail = fetch_member_detail(session, meta)
-            print(f"→ {detail['name']}")
-            cards_html.append(render_card(detail))
-        except Exception as e:
-            print(f"→ ⚠️  {e}")
-        time.sleep(0.4)
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(HTML_HEAD)
-        f.write("\n".join(cards_html))
-        f.write(HTML_FOOT)
-
-    print(f"\n✅  Fatto! → {output_file}  ({len(cards_html)}/{len(members_meta)} membri)")
+            with open(os.path.join(args.raw_dir, list_fixture_name(chapter.chapter_id)),
+                      encoding="utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            print(f"⚠️  {chapter.name}: memberlist non scaricata ({e})")
+            continue
+        list_soup    = BeautifulSoup(text, FAST_PARSER if args.fast_parse else "html.parser")
+        members_meta = chapter_members(chapter, list_soup)
+        slots = []
+        for meta in members_meta:
+            path = os.path.join(args.raw_dir, "memberdetail", fixture_name(meta["id"]))
+            try:
+                with open(path, encoding="utf-8") as f:
+                    jobs.append((f.read(), meta, args.fast_parse))
+                slots.append(len(jobs) - 1)
+            except OSError as e:
+                slots.append(e)
+        if members_meta:
+            batches.append((chapter, members_meta, slots))
+
+    parsed = parse_batch(jobs, args.parse_workers)
+    db     = MemberDB(args.db) if args.db else None
+    for chapter, members_meta, slots in batches:
+        if len(chapters) > 1:
+            print(f"\n🏷️  {chapter.name} ({chapter.city})")
+
+        def results():
+            for meta, slot in zip(members_meta, slots):
+                if isinstance(slot, Exception):
+                    yield meta, None, slot
+                    continue
+                detail, err = parsed[slot]
+                yield meta, detail, (None if err is None else ValueError(err))
+
+        stats    = {"changed": 0, "stale": 0}
+        snapshot = list(member_records(results(), SnapshotHashes(chapter.snapshot), stats,
+                                       len(members_meta)))
+        os.makedirs(os.path.dirname(chapter.snapshot) or ".", exist_ok=True)
+        write_snapshot(chapter.snapshot, snapshot)
+        if db:
+            db.stage(chapter, snapshot)
+        print(f"🧩  {len(snapshot)}/{len(members_meta)} membri → {chapter.snapshot}  "
+              f"({stats['changed']} nuovi/modificati"
+              + (f", {stats['stale']} dai dati precedenti)" if stats["stale"] else ")"))
+    if db:
+        save_db(db)
+
+
+def stage_render(args: argparse.Namespace):
+    # Fase 3: dagli snapshot (o dal database con --db) al sito, senza rete né
+    # parsing HTML
+    chapters, index_file = resolve_chapters(args)
+    db       = MemberDB(args.db) if args.db else None
+    renderer = RenderCache(RENDER_CACHE_FILE, sprite=args.self_host)
+    images   = ImageStore(None) if args.images else None
+    fonts    = site_fonts(args)
+    counts   = {}
+    for chapter in chapters:
+        entries = db.records(chapter) if db else list(iter_snapshot(chapter.snapshot))
+        if not entries:
+            print(f"⚠️  {chapter.name}: nessun membro in "
+                  f"{db.path if db else chapter.snapshot}")
+            continue
+        if len(chapters) > 1:
+            print(f"\n🏷️  {chapter.name} ({chapter.city})")
+        build   = chapter_build(chapter, [e.id for e in entries], args, fonts,
+                                renderer.sprite, images)
+        results = (({"id": e.id, "name_raw": e.name}, e.member, None)
+                   for e in entries[build.resumed:])
+        counts[chapter.slug] = build_chapter(build, entries, results, renderer, images,
+                                             None, fonts, args.search, args.lazy, args.history)
+    renderer.save()
+    if db:
+        db.close()
+    if images:
+        images.save(prune=False)
+    print(f"   card: {renderer.stats['rendered']} renderizzate, "
+          f"{renderer.stats['reused']} riusate")
+    if index_file:
+        publish_index(chapters, counts, index_file, fonts, args.minify, args.service_worker)
+    if args.service_worker:
+        publish_service_worker(chapters, index_file, fonts, args)
+
+
+def stage_history(args: argparse.Namespace):
+    # Interrogazione dello storico: cambiamenti degli ultimi --days giorni oppure,
+    # con --at, l'elenco dei membri a una certa data
+    chapters, _ = resolve_chapters(args)
+    for chapter in chapters:
+        history = History(history_path(chapter))
+        if not history.index["checkpoints"]:
+            print(f"⚠️  {chapter.name}: nessuno storico in {history.path} (usa --history)")
+            continue
+        if args.at:
+            roster = history.roster_at(args.at + ("" if "T" in args.at else "T23:59:59Z"))
+            print(f"📜  {chapter.name} al {args.at}: {len(roster)} membri")
+            for m in sorted(roster.values(), key=lambda m: m["name"]):
+                print(f"   {m['name'][:40]:40s} {m['profession']}")
+            continue
+        since = utc_stamp(datetime.now(timezone.utc) - timedelta(days=args.days))
+        print(f"📜  {chapter.name}: cambiamenti dal {since[:10]}")
+        for e in history.changes(since):
+            for row in e["added"]:
+                print(f"   {e['at'][:10]}  + {row[1]}")
+            for _, name in e["removed"]:
+                print(f"   {e['at'][:10]}  − {name}")
+            for _, name, diff in e["changed"]:
+                print(f"   {e['at'][:10]}  ~ {name}: " + ", ".join(
+                    f"{f} {old!r} → {new!r}" for f, (old, new) in diff.items()))
+
+
+def stage_query(args: argparse.Namespace):
+    # Ricerca full-text nel database di --db, su tutti i capitoli
+    db = MemberDB(args.db or DB_FILE)
+    try:
+        rows = db.search(args.match or "")
+    except sqlite3.OperationalError as e:
+        raise SystemExit(f"❌  Query non valida: {e}")
+    finally:
+        db.close()
+    print(f"🔎  {len(rows)} membri per \"{args.match}\" in {db.path}")
+    for chapter, name, profession, company in rows:
+        print(f"   {name[:30]:30s} {profession[:30]:30s} {company[:30]:30s} {chapter}")
+
+
+STAGES = {"fetch": stage_fetch, "parse": stage_parse, "render": stage_render,
+          "history": stage_history, "query": stage_query}
+
+
+@contextmanager
+def metrics_report(args: argparse.Namespace):
+    # Profilo (--profile) attorno a un'esecuzione; alla fine, anche se fallisce,
+    # metriche scritte in args.metrics e riassunto a video
+    if args.profile:
+        METRICS.profiler = Profiler(args.profile)
+        METRICS.profiler.start()
+    try:
+        yield
+    finally:
+        peak = METRICS.profiler.stop() if METRICS.profiler else None
+        METRICS.profiler = None
+        print_metrics(METRICS.write(args.metrics), args.metrics)
+        if peak is not None:
+            print(f"   profilo → {args.profile}  (picco memoria {peak / 1024 / 1024:.1f} MB)")
+
+
+def watch(args: argparse.Namespace, recorder: Recorder = None):
+    # Modalità continua: ogni `args.watch` secondi si scarica solo la memberlist e
+    # si ricostruisce (in modo differenziale) quando cambia l'elenco o una riga,
+    # oppure dopo --max-age, riusando la memberlist appena scaricata. Una sola
+    # sessione e metriche azzerate a ogni giro: connessioni e memoria non crescono
+    # con i giorni di esecuzione. --record e --profile valgono per ogni ricostruzione
+    import_network()
+    import_parser()
+    chapters, _ = resolve_chapters(args)
+    session = make_session(args.workers)
+    retry   = RetryPolicy(args.retries)
+    args.diff = True
+    seen, built = {}, None
+    print(f"👀  Controllo della memberlist ogni {args.watch:g}s (Ctrl+C per terminare)")
+    try:
+        while True:
+            METRICS.reset()
+            try:
+                rosters = {c.slug: poll_roster(session, c, args.fast_parse, recorder, retry)
+                           for c in chapters}
+                prints  = {slug: roster_fingerprint(m) for slug, m in rosters.items()}
+            except Exception as e:
+                print(f"⚠️  {datetime.now():%H:%M:%S} memberlist non disponibile: {e}")
+            else:
+                changed = [c.name for c in chapters if seen.get(c.slug) != prints[c.slug]]
+                if changed or time.monotonic() - built >= args.max_age:
+                    why = ("elenco cambiato: " + ", ".join(changed) if changed
+                           else "riverifica periodica")
+                    print(f"\n🔄  {datetime.now():%Y-%m-%d %H:%M:%S} – {why}")
+                    try:
+                        with metrics_report(args):
+                            run(args, recorder, session, rosters)
+                        seen, built = prints, time.monotonic()
+                    except Exception as e:
+                        print(f"⚠️  Ricostruzione non riuscita: {e}")
+                    gc.collect()
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        print("\n👋  Controllo terminato")
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    global BASE_URL
+    args = parse_args(argv)
+    if args.base_url:
+        BASE_URL = args.base_url.rstrip("/")
+    recorder = Recorder(args.record) if args.record else None
+    if recorder:
+        args.refresh = True
+    if args.watch:
+        return watch(args, recorder)
+
+    METRICS.reset()
+    with metrics_report(args):
+        if args.stage in STAGES:
+            STAGES[args.stage](args)
+        else:
+            run(args, recorder)
 
 
 if __name__ == "__main__":
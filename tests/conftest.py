@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Gli script stanno alla radice del repository, senza pacchetto da installare
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
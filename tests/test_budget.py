@@ -0,0 +1,26 @@
+import os
+
+import bni_budget
+import bni_scraper
+
+BUDGET = {"default": {"images_without_lazy": 1},
+          "pages": {"index.html": {"images_without_lazy": 50}}}
+
+
+def test_override_matches_only_the_exact_path():
+    assert bni_budget.page_budget(BUDGET, "./index.html")["images_without_lazy"] == 50
+    chapter = os.path.join("chapters", "17-riviere-liguri-corsaro-nero", "index.html")
+    assert bni_budget.page_budget(BUDGET, chapter)["images_without_lazy"] == 1
+
+
+def test_override_is_relative_to_the_site_root(tmp_path):
+    page = str(tmp_path / "site" / "index.html")
+    assert bni_budget.page_budget(BUDGET, page, str(tmp_path / "site"))["images_without_lazy"] == 50
+    assert bni_budget.page_budget(BUDGET, page, str(tmp_path))["images_without_lazy"] == 1
+
+
+def test_remote_logo_has_dimensions():
+    logo = bni_scraper.card_logo({"company_logo": "https://example.com/logo.svg"})
+    stats = bni_budget.PageStats()
+    stats.feed(logo)
+    assert stats.no_size == 0 and stats.no_lazy == 0
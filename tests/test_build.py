@@ -0,0 +1,50 @@
+from dataclasses import replace
+
+import pytest
+
+import bni_scraper
+
+IDS = ["a", "b", "c"]
+
+
+@pytest.fixture
+def chapter(tmp_path, monkeypatch):
+    # BUILD_DIR è relativo: ogni test lavora in una cartella sua
+    monkeypatch.chdir(tmp_path)
+    return replace(bni_scraper.default_chapter(), output="index.html",
+                   snapshot="members.jsonl")
+
+
+def build(chapter, *argv):
+    args = bni_scraper.parse_args(list(argv))
+    return bni_scraper.chapter_build(chapter, IDS, args, None, args.self_host, None)
+
+
+def interrupted(chapter, *argv):
+    # Primo lotto scritto, poi l'esecuzione si ferma prima di finish()
+    first = build(chapter, *argv)
+    first.write(2, [], ['<div class="member-card">a</div>', '<div class="member-card">b</div>'],
+                rows={"a": {"row": "r1", "checked_at": 1}})
+    for f in first.files.values():
+        f.close()
+    return first
+
+
+def test_checkpoint_resumes_with_same_options(chapter):
+    interrupted(chapter)
+    again = build(chapter)
+    assert again.resumed == 2
+    assert again.list_rows() == {"a": {"row": "r1", "checked_at": 1}}
+
+
+@pytest.mark.parametrize("option", ["--lazy", "--self-host", "--minify", "--search",
+                                    "--history", "--service-worker"])
+def test_checkpoint_ignored_when_options_change(chapter, option):
+    interrupted(chapter)
+    assert build(chapter, option).resumed == 0
+
+
+def test_checkpoint_ignored_when_list_changes(chapter):
+    interrupted(chapter)
+    args = bni_scraper.parse_args([])
+    assert bni_scraper.chapter_build(chapter, IDS[:2], args).resumed == 0
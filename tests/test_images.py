@@ -0,0 +1,59 @@
+import io
+import os
+
+import pytest
+
+import bni_scraper
+
+Image = pytest.importorskip("PIL.Image")
+
+
+class Response:
+    def __init__(self, status: int, content: bytes = b""):
+        self.status_code = status
+        self.content     = content
+        self.headers     = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+
+class Session:
+    def __init__(self, files: dict):
+        self.files = files
+
+    def get(self, url, headers=None, timeout=None):
+        return Response(200, self.files[url]) if url in self.files else Response(404)
+
+
+def png(color: str) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (200, 200), color).save(out, "PNG")
+    return out.getvalue()
+
+
+def run(directory, files, urls):
+    store = bni_scraper.ImageStore(Session(files), str(directory))
+    found = {u: store._safe_fetch(u, "photo") for u in urls}
+    store.save()
+    return store, found
+
+
+def test_failed_image_keeps_previous_thumbnails_and_prunes_the_rest(tmp_path):
+    first, _ = run(tmp_path, {"a": png("red"), "b": png("blue")}, ["a", "b"])
+    a_files = {n for f in first.used["a"]["files"].values() for n in f.values()}
+
+    # "a" ora risponde 404, "b" non è più usato, "c" è nuovo
+    second, found = run(tmp_path, {"c": png("green")}, ["a", "c"])
+    assert second.stats["failed"] == 1
+    assert found["a"] == first.used["a"]
+    names = set(os.listdir(tmp_path))
+    assert a_files <= names
+    assert not {n for f in first.used["b"]["files"].values() for n in f.values()} & names
+    assert set(bni_scraper.ImageStore(None, str(tmp_path)).manifest) == {"a", "c"}
+
+
+def test_failed_image_without_previous_entry_is_dropped(tmp_path):
+    store, found = run(tmp_path, {}, ["x"])
+    assert found["x"] is None and store.used == {}
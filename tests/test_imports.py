@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_module_import_loads_no_optional_dependencies():
+    # render, history e query, il server di fixture e il benchmark importano il
+    # modulo: rete, parser, Pillow e brotli si caricano solo quando servono
+    code = ("import sys, bni_scraper; "
+            "print(sorted(m for m in ('requests', 'bs4', 'PIL', 'brotli') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,41 @@
+import gzip
+
+import pytest
+
+import bni_scraper
+
+
+def test_minify_css_keeps_quoted_strings():
+    css = """.left::before{ content: "\\2212  " ; color: red }
+.font { font-family: 'Playfair  Display' , serif }
+.note::after { content: "/* non è un commento */" }  /* questo sì */"""
+    small = bni_scraper.minify_css(css)
+    assert 'content:"\\2212  "' in small
+    assert "'Playfair  Display',serif" in small
+    assert 'content:"/* non è un commento */"' in small
+    assert "questo sì" not in small
+
+
+def test_minified_changelog_keeps_content_spacing():
+    page = bni_scraper.minify_html(bni_scraper.CHANGELOG_PAGE.template)
+    assert 'content:"\\2212  "' in page
+    assert 'content:"\\21BB  "' in page
+
+
+def test_precompress_without_brotli_removes_stale_br(tmp_path, monkeypatch):
+    page = tmp_path / "index.html"
+    page.write_text("<p>nuova</p>\n", encoding="utf-8")
+    (tmp_path / "index.html.br").write_bytes(b"vecchia")
+    monkeypatch.setattr(bni_scraper, "brotli", False)
+    sizes = bni_scraper.precompress(str(page))
+    assert sizes["brotli"] is None and sizes["gzip"]
+    assert not (tmp_path / "index.html.br").exists()
+    assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == page.read_bytes()
+
+
+def test_precompress_with_brotli_writes_br(tmp_path):
+    brotli = pytest.importorskip("brotli")
+    page = tmp_path / "index.html"
+    page.write_text("<p>nuova</p>\n", encoding="utf-8")
+    bni_scraper.precompress(str(page))
+    assert brotli.decompress((tmp_path / "index.html.br").read_bytes()) == page.read_bytes()
@@ -0,0 +1,28 @@
+from dataclasses import replace
+
+import bni_scraper
+
+MEMBER = {"name": 'Anna "Ape" Rossi', "photo": "", "profession": "R&D", "company": "<Rossi>",
+          "address": "", "phone": "0184-12/34 56", "email": "", "bio": "", "company_logo": "",
+          "detail_url": "", "social": {"website": "https://x.it/?a=1&b=2"}}
+
+
+def test_card_escapes_every_text_field():
+    card = bni_scraper.render_card(MEMBER)
+    assert "&quot;Ape&quot;" in card and "R&amp;D" in card and "&lt;Rossi&gt;" in card
+    assert 'href="https://x.it/?a=1&amp;b=2"' in card
+    assert 'href="tel:0184123456"' in card
+    plain = dict(MEMBER, name="Anna Rossi", profession="R", company="Rossi", social={})
+    assert bni_scraper.card_values(plain) is plain
+
+
+def test_index_and_changelog_escape_chapter_names():
+    chapter = replace(bni_scraper.default_chapter(), name="A&B <x>", city='"Sanremo"',
+                      output="chapters/ab/index.html")
+    index = bni_scraper.render_index([chapter], {chapter.slug: 3}, "index.html")
+    assert "A&amp;B &lt;x&gt;" in index and "&quot;Sanremo&quot;" in index
+    entries = [{"at": "2026-01-01T00:00:00Z", "fields": ["id", "name", "profession"],
+                "added": [["1", "<b>Nuovo</b>", "R&D"]], "removed": [], "changed": []}]
+    page = bni_scraper.render_changelog(chapter, entries, "chapters/ab/changelog.html")
+    assert "&lt;b&gt;Nuovo&lt;/b&gt;" in page and "R&amp;D" in page
+    assert "A&amp;B &lt;x&gt;" in page and "A&B <x>" not in page
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import bni_scraper
+from bni_scraper import History, MemberRecord, iter_snapshot, write_snapshot
+
+RECORDS = [MemberRecord("a", "h1", "Anna Rossi", company="Rossi & C."),
+           MemberRecord("b", "h2", "Bruno Verdi", instagram="https://instagram.com/b"),
+           MemberRecord("c", "h3", "Carla Bianchi", bio="Riga uno\nriga due")]
+
+
+@pytest.mark.parametrize("name", ["members.jsonl", "members.jsonl.gz"])
+def test_snapshot_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    assert write_snapshot(path, RECORDS)
+    assert list(iter_snapshot(path)) == RECORDS
+    # Stessi membri → stessi byte: il file non viene riscritto
+    assert not write_snapshot(path, RECORDS)
+
+
+def test_snapshot_skips_bad_rows(tmp_path):
+    path = tmp_path / "members.jsonl"
+    write_snapshot(str(path), RECORDS)
+    head, a, b, c = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    path.write_text(head + a + '["x", "h",' + "\n"      # JSON troncato
+                    + '["y"' + ', ""' * len(RECORDS[0].to_row()) + "]\n"   # un campo in più
+                    + "[]\n"                                  # senza id
+                    + b + c, encoding="utf-8")
+    assert [r.id for r in iter_snapshot(str(path))] == ["a", "b", "c"]
+
+
+def test_snapshot_other_schema_skips_rows_without_id(tmp_path):
+    path = tmp_path / "members.jsonl"
+    head = {"version": bni_scraper.SNAPSHOT_VERSION, "fields": ["id", "name", "fax"]}
+    path.write_text("\n".join(map(bni_scraper.json.dumps, [
+        head, ["a", "Anna", "0184"], [], ["b", "Bruno", ""],
+    ])) + "\n", encoding="utf-8")
+    assert [(r.id, r.name) for r in iter_snapshot(str(path))] == [("a", "Anna"), ("b", "Bruno")]
+
+
+def test_snapshot_truncated_gzip(tmp_path):
+    path = str(tmp_path / "members.jsonl.gz")
+    write_snapshot(path, RECORDS)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:len(data) // 2])
+    # Si legge quel che c'è, senza eccezioni
+    assert all(r in RECORDS for r in iter_snapshot(path))
+
+
+def roster(*names):
+    return [MemberRecord(str(i), name=n) for i, n in enumerate(names) if n]
+
+
+def test_history_roster_at_across_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(bni_scraper, "HISTORY_CHECKPOINT", 3)
+    path    = str(tmp_path / "history.jsonl")
+    history = History(path)
+    states  = [roster("Anna", "Bruno"),
+               roster("Anna", "Bruno", "Carla"),
+               roster("Anna", "", "Carla"),
+               roster("Anna Rossi", "", "Carla"),
+               roster("Anna Rossi", "Bruno", "Carla"),
+               roster("Anna Rossi", "Bruno", "", "Dario"),
+               roster("Anna Rossi", "Bruno", "", "Dario", "Elena")]
+    stamps  = [f"2026-01-{d:02d}T08:00:00Z" for d in range(1, len(states) + 1)]
+    for state, at in zip(states, stamps):
+        assert history.append(state, at) is not None
+    # Nessuna modifica, nessuna riga
+    assert history.append(states[-1], "2026-02-01T08:00:00Z") is None
+    assert len(history.index["checkpoints"]) == 3
+
+    def names(h, at):
+        return {i: m["name"] for i, m in h.roster_at(at).items()}
+
+    for state, at in zip(states, stamps):
+        expected = {r.id: r.name for r in state}
+        assert names(history, at) == expected
+        # Tra due esecuzioni vale lo stato della precedente
+        assert names(history, at.replace("08:00", "12:00")) == expected
+    assert names(history, "2025-12-31T00:00:00Z") == {}
+
+    # Senza indice lo si ricostruisce dallo storico, con gli stessi risultati
+    os.remove(path + ".idx")
+    rebuilt = History(path)
+    assert rebuilt.index == history.index
+    for at in stamps:
+        assert names(rebuilt, at) == names(history, at)